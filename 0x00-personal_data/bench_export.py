@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Check and scaling benchmark of the sharded export with an SQLite stand-in.
+"""
+import io
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import List
+
+import filtered_logger
+from filtered_logger import export_sharded
+
+ROWS = 200000
+DB_PATH = os.path.join(tempfile.mkdtemp(), "users.db")
+PARENT_PID = None
+TIMESTAMP = re.compile(r" \d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}: ")
+
+
+class StandInCursor:
+    """sqlite3 cursor taking the %s placeholders of mysql.connector."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def __enter__(self) -> 'StandInCursor':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._cursor.close()
+
+    def execute(self, query: str, params: tuple = ()) -> None:
+        """Runs a query written for mysql.connector."""
+        self._cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchone(self) -> tuple:
+        """Fetches the next row."""
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int) -> List[tuple]:
+        """Fetches the next rows."""
+        return self._cursor.fetchmany(size)
+
+
+class StandInConnection:
+    """sqlite3 connection shaped like a mysql.connector one."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+
+    def cursor(self, buffered: bool = None) -> StandInCursor:
+        """Opens a cursor, ignoring the buffering mode."""
+        return StandInCursor(self._connection.cursor())
+
+    def close(self) -> None:
+        """Closes the connection."""
+        self._connection.close()
+
+
+def connect() -> StandInConnection:
+    """Connects to the stand-in users table."""
+    return StandInConnection(DB_PATH)
+
+
+def connect_failing() -> StandInConnection:
+    """Connects, except in the pool workers, which fail mid-export."""
+    if os.getpid() != PARENT_PID:
+        raise sqlite3.OperationalError("worker lost its connection")
+    return connect()
+
+
+def populate(rows: int) -> None:
+    """Creates the users table the export reads."""
+    connection = sqlite3.connect(DB_PATH)
+    connection.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, {});".format(
+            ", ".join(filtered_logger.USER_FIELDS)))
+    connection.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);",
+        ((i, "user_{}".format(i), "user_{}@example.com".format(
+            i), "(555) 010-{:04d}".format(i % 10000), "000-00-{:04d}".format(
+            i % 10000), "pwd_{}".format(i), "10.{}.{}.{}".format(
+            i >> 16, (i >> 8) & 255, i & 255), "2019-11-14 06:14:24",
+            "agent") for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def export(workers: int, connect_func=connect) -> List[str]:
+    """Runs the export, returning its lines without timestamps."""
+    sink = io.StringIO()
+    export_sharded(workers, sink, "id", connect_func)
+    return TIMESTAMP.sub(" ", sink.getvalue()).splitlines()
+
+
+def check(problems: List[str], label: str, ok: bool) -> None:
+    """Records a failed expectation."""
+    print("{:<48} {}".format(label, "ok" if ok else "FAILED"))
+    if not ok:
+        problems.append(label)
+
+
+def main():
+    """Times 1, 2 and 4 workers and checks the output, exiting 1 on a
+    failure."""
+    global PARENT_PID
+    PARENT_PID = os.getpid()
+    shard_dir = tempfile.mkdtemp()
+    tempfile.tempdir = shard_dir
+    populate(ROWS)
+    problems = []
+    print("{:,} rows on {} CPUs".format(ROWS, os.cpu_count()))
+    print("{:>8} {:>12} {:>10}".format("workers", "rows/s", "speedup"))
+    outputs = {}
+    base_rate = None
+    for workers in (1, 2, 4):
+        start = time.perf_counter()
+        outputs[workers] = export(workers)
+        rate = ROWS / (time.perf_counter() - start)
+        base_rate = base_rate or rate
+        print("{:>8} {:>12,.0f} {:>9.2f}x".format(
+            workers, rate, rate / base_rate))
+    lines = outputs[1]
+    check(problems, "one line per row", len(lines) == ROWS)
+    check(problems, "same output for 1, 2 and 4 workers",
+          lines == outputs[2] == outputs[4])
+    ips = [re.search(r"ip=([^;]*);", line).group(1) for line in lines]
+    check(problems, "rows in key order", ips == [
+        "10.{}.{}.{}".format(i >> 16, (i >> 8) & 255, i & 255)
+        for i in range(ROWS)])
+    pii = re.compile(r"user_\d|pwd_|000-00-")
+    check(problems, "PII fields redacted",
+          not any(pii.search(line) for line in lines))
+    try:
+        export(2, connect_failing)
+        failed = False
+    except sqlite3.OperationalError:
+        failed = True
+    check(problems, "a failing worker fails the export", failed)
+    check(problems, "no shard file left behind", os.listdir(shard_dir) == [])
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of the batch password hashing API.
+"""
+import time
+
+from encrypt_password import (
+    hash_password, hash_passwords, verify_many)
+
+
+def main():
+    """Prints hashes and verifications per second for several pool sizes."""
+    rounds = 8
+    passwords = ["password_{}".format(i) for i in range(256)]
+    start = time.perf_counter()
+    hashes = [hash_password(pwd, rounds) for pwd in passwords]
+    inline = len(passwords) / (time.perf_counter() - start)
+    print("inline: {:,.0f} hashes/s".format(inline))
+    print("{:>8} {:>12} {:>12}".format("workers", "hashes/s", "verifies/s"))
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        list(hash_passwords(passwords, rounds, workers))
+        hashed = len(passwords) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        list(verify_many(zip(hashes, passwords), workers))
+        verified = len(passwords) / (time.perf_counter() - start)
+        print("{:>8} {:>12,.0f} {:>12,.0f}".format(
+            workers, hashed, verified))
+
+
+if __name__ == "__main__":
+    main()
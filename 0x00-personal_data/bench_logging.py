@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Caller-side latency benchmark of the synchronous and queued loggers.
+"""
+import os
+import time
+from typing import List
+
+from bench_redaction import make_record
+from filtered_logger import get_logger
+
+
+def percentile(samples: List[int], pct: float) -> float:
+    """Returns a percentile of sorted samples, in microseconds."""
+    index = min(len(samples) - 1, int(len(samples) * pct / 100))
+    return samples[index] / 1000
+
+
+def measure(queued: bool, number: int) -> List[int]:
+    """Times each logger.info call on the calling thread."""
+    messages = [make_record(i).msg for i in range(number)]
+    with open(os.devnull, 'w') as devnull:
+        logger = get_logger(queued, devnull)
+        samples = []
+        for msg in messages:
+            start = time.perf_counter_ns()
+            logger.info(msg)
+            samples.append(time.perf_counter_ns() - start)
+        for handler in list(logger.handlers):
+            if hasattr(handler, 'listener'):
+                handler.listener.stop()
+            logger.removeHandler(handler)
+    return sorted(samples)
+
+
+def main():
+    """Prints the p50 and p99 latency of logger.info for each mode."""
+    number = 50000
+    print("{:>7} {:>10} {:>10} {:>10}".format(
+        "mode", "p50 (us)", "p99 (us)", "max (us)"))
+    for queued in (False, True):
+        samples = measure(queued, number)
+        print("{:>7} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            "queued" if queued else "sync", percentile(samples, 50),
+            percentile(samples, 99), samples[-1] / 1000))
+
+
+if __name__ == "__main__":
+    main()
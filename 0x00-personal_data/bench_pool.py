@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Reuse check and throughput of ConnectionPool with a stand-in connector.
+"""
+import sys
+import threading
+import time
+from typing import List
+
+from filtered_logger import ConnectionPool
+
+
+class FakeConnection:
+    """Stand-in for a MySQL connection that can be made to drop."""
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def is_connected(self) -> bool:
+        """Answers the ping of the pool."""
+        return self.alive
+
+    def rollback(self) -> None:
+        """Ends the open transaction, failing once the link is down."""
+        if not self.alive:
+            raise ConnectionError("lost connection")
+        self.in_transaction = False
+        self.rollbacks += 1
+
+    def close(self) -> None:
+        """Closes the connection."""
+        self.closed = True
+
+
+def borrow(pool: ConnectionPool, number: int, opened: List) -> None:
+    """Borrows and gives back a connection `number` times."""
+    for _ in range(number):
+        connection = pool.acquire()
+        opened.append(connection._connection)
+        time.sleep(0.0005)
+        connection.close()
+
+
+def check(problems: List[str], label: str, ok: bool) -> None:
+    """Records a failed expectation."""
+    print("{:<48} {}".format(label, "ok" if ok else "FAILED"))
+    if not ok:
+        problems.append(label)
+
+
+def main():
+    """Runs the reuse and discard scenarios, exiting 1 on a failure."""
+    problems = []
+    size, threads, borrows = 2, 4, 50
+    connections = []
+
+    def connect() -> FakeConnection:
+        connection = FakeConnection()
+        connections.append(connection)
+        return connection
+
+    pool = ConnectionPool(connect, size)
+    opened = []
+    workers = [threading.Thread(target=borrow, args=(pool, borrows, opened))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    print("{} borrows over {} slots in {:.3f}s, max wait {:.2f} ms".format(
+        stats["borrows"], size, elapsed, stats["max_wait"] * 1000))
+    check(problems, "created == size", stats["created"] == size)
+    check(problems, "reused > 0", stats["reused"] > 0)
+    check(problems, "created + reused == borrows",
+          stats["created"] + stats["reused"] == threads * borrows)
+    check(problems, "nothing borrowed, size idle",
+          stats["borrowed"] == 0 and stats["idle"] == size)
+    check(problems, "only pooled connections handed out",
+          set(map(id, opened)) <= set(map(id, connections)))
+
+    for connection in connections:
+        connection.alive = False
+    connection = pool.acquire()
+    stats = pool.stats()
+    check(problems, "failed ping discards every idle connection",
+          stats["discarded"] == size and stats["idle"] == 0)
+    check(problems, "discarded connections are closed",
+          all(c.closed for c in connections[:size]))
+    check(problems, "a fresh connection replaces them",
+          stats["created"] == size + 1
+          and connection._connection is connections[-1])
+    connection.close()
+
+    pool.idle_timeout = 0
+    time.sleep(0.01)
+    pool.acquire().close()
+    stats = pool.stats()
+    check(problems, "idle timeout discards the connection",
+          stats["discarded"] == size + 1 and stats["created"] == size + 2)
+
+    pool.idle_timeout = 300
+    with pool.acquire() as connection:
+        fake = connection._connection
+        fake.in_transaction = True
+    check(problems, "leaving the with block returns the connection",
+          pool.stats()["borrowed"] == 0 and pool.stats()["idle"] == 1)
+    check(problems, "release rolls the transaction back",
+          not fake.in_transaction and fake.rollbacks > 0)
+    connection = pool.acquire()
+    connection._connection.alive = False
+    connection.close()
+    stats = pool.stats()
+    check(problems, "a failed rollback discards the connection",
+          stats["idle"] == 0 and stats["discarded"] == size + 2
+          and fake.closed)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the log line redaction engines.
+"""
+import logging
+import re
+import timeit
+from typing import List
+
+from filtered_logger import (
+    patterns, filter_datum, PII_FIELDS, RedactingFormatter)
+
+
+def legacy_filter_datum(
+        fields: List[str], redaction: str, message: str,
+        separator: str) -> str:
+    """Filters a log line by rebuilding the pattern on every call."""
+    extract, replace = (patterns["extract"], patterns["replace"])
+    return re.sub(extract(fields, separator), replace(redaction), message)
+
+
+def make_line(fields: List[str]) -> str:
+    """Builds a log line holding a value for every field."""
+    return ''.join('{}=value_{};'.format(f, i) for i, f in enumerate(fields))
+
+
+def lines_per_sec(func, fields: List[str], number: int) -> float:
+    """Measures how many lines per second a filter handles."""
+    line = make_line(fields)
+    elapsed = timeit.timeit(
+        lambda: func(fields, "***", line, ";"), number=number)
+    return number / elapsed
+
+
+def make_record(index: int) -> logging.LogRecord:
+    """Builds a user record the way filtered_logger.main does."""
+    row = (
+        "user_{}".format(index), "user_{}@example.com".format(index),
+        "(555) 010-{:04d}".format(index % 10000), "000-00-{:04d}".format(
+            index % 10000), "$2b$12$" + "x" * 53, "10.0.{}.{}".format(
+            index % 256, index // 256 % 256), "2019-11-14T06:14:24",
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
+    fields = ("name", "email", "phone", "ssn", "password", "ip",
+              "last_login", "user_agent")
+    record = '; '.join('{}={}'.format(col, val) for col, val in zip(
+        fields, row))
+    msg = '{};'.format(record)
+    args = ("user_data", logging.INFO, None, None, msg, None, None)
+    return logging.LogRecord(*args)
+
+
+def compare_modes(number: int):
+    """Prints the throughput of each RedactingFormatter mode."""
+    records = [make_record(i) for i in range(1000)]
+    many_fields = list(PII_FIELDS) + ["field_{}".format(i) for i in range(45)]
+    print("{:>7} {:>14} {:>14}".format("fields", "regex (l/s)", "token (l/s)"))
+    for fields in (list(PII_FIELDS), many_fields):
+        results = []
+        for mode in ("regex", "token"):
+            formatter = RedactingFormatter(fields, mode)
+            elapsed = timeit.timeit(
+                lambda: [formatter.format(r) for r in records],
+                number=number // len(records))
+            results.append(number / elapsed)
+        print("{:>7} {:>14,.0f} {:>14,.0f}".format(len(fields), *results))
+
+
+def main():
+    """Prints the before and after throughput for several field counts."""
+    number = 20000
+    print("{:>7} {:>14} {:>14} {:>8}".format(
+        "fields", "before (l/s)", "after (l/s)", "speedup"))
+    for count in (1, 5, 50):
+        fields = ["field_{}".format(i) for i in range(count)]
+        before = lines_per_sec(legacy_filter_datum, fields, number)
+        after = lines_per_sec(filter_datum, fields, number)
+        print("{:>7} {:>14,.0f} {:>14,.0f} {:>7.2f}x".format(
+            count, before, after, after / before))
+    print()
+    compare_modes(number)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,104 @@
 """
 Password encryption module.
 """
+import os
+import time
 import bcrypt
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Iterator, Tuple
 
 
-def hash_password(password: str) -> bytes:
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+TARGET_HASH_MS = 50
+CALIBRATION_SAMPLES = 3
+TASKS_PER_WORKER = 2
+
+
+def hash_password(password: str, rounds: int = DEFAULT_ROUNDS) -> bytes:
     """Hashes a password using a random salt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
     """Checks if a hashed password matches the provided password."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def get_rounds(hashed_password: bytes) -> int:
+    """Reads the cost factor stored in a bcrypt hash."""
+    return int(hashed_password.split(b'$')[2])
+
+
+def needs_rehash(hashed_password: bytes, rounds: int) -> bool:
+    """Checks if a hash was made with a lower cost factor.
+
+    Hashes are never downgraded.
+    """
+    return get_rounds(hashed_password) < rounds
+
+
+def _time_hash(rounds: int) -> float:
+    """Measures the median of a few hashes at a cost, in milliseconds."""
+    samples = []
+    for _ in range(CALIBRATION_SAMPLES):
+        start = time.perf_counter()
+        hash_password("calibration", rounds)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def calibrate_rounds(target_ms: float = TARGET_HASH_MS) -> int:
+    """Finds the highest cost factor hashing within the target latency.
+
+    The result is never below DEFAULT_ROUNDS. Only that cost is timed,
+    each extra round doubling the work.
+    """
+    rounds = DEFAULT_ROUNDS
+    hash_ms = _time_hash(rounds)
+    while rounds < MAX_ROUNDS and hash_ms * 2 <= target_ms:
+        hash_ms *= 2
+        rounds += 1
+    return rounds
+
+
+def _is_valid_pair(pair: Tuple[bytes, str]) -> bool:
+    """Checks a (hashed_password, password) pair."""
+    return is_valid(*pair)
+
+
+def _ordered_map(
+        func: Callable, items: Iterable, workers: int = None) -> Iterator:
+    """Runs func over a process pool and yields results in input order.
+
+    Only a few tasks per worker are in flight at a time, so items are
+    consumed lazily.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def hash_passwords(
+        passwords: Iterable[str], rounds: int = DEFAULT_ROUNDS,
+        workers: int = None) -> Iterator[bytes]:
+    """Hashes many passwords across a process pool, in input order."""
+    hash_func = partial(hash_password, rounds=rounds)
+    return _ordered_map(hash_func, passwords, workers)
+
+
+def verify_many(
+        pairs: Iterable[Tuple[bytes, str]],
+        workers: int = None) -> Iterator[bool]:
+    """Checks many (hashed_password, password) pairs across a process pool.
+    """
+    return _ordered_map(_is_valid_pair, pairs, workers)
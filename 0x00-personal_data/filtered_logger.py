@@ -4,9 +4,20 @@ Personal data filtering and logging module.
 """
 import os
 import re
+import sys
+import queue
+import time
+import atexit
+import shutil
 import logging
+import logging.handlers
+import tempfile
+import threading
+import multiprocessing
 import mysql.connector
-from typing import List
+from functools import lru_cache
+from typing import (
+    Callable, Iterable, Iterator, List, Sequence, TextIO, Tuple, Union)
 
 
 patterns = {
@@ -14,24 +25,201 @@ patterns = {
     'replace': lambda x: r'\g<field>={}'.format(x),
 }
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+REDACTOR_CACHE_SIZE = 128
+USER_FIELDS = (
+    "name", "email", "phone", "ssn", "password", "ip", "last_login",
+    "user_agent")
+DEFAULT_BATCH_SIZE = 1000
+SHARDS_PER_WORKER = 4
+DEFAULT_LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'count')
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_IDLE_TIMEOUT = 300
+
+
+class Redactor:
+    """Redaction engine compiled once for a set of fields."""
+
+    def __init__(self, fields: Tuple[str, ...], separator: str):
+        self.fields = fields
+        self.separator = separator
+        self.pattern = re.compile(patterns["extract"](fields, separator))
+
+    def redact(self, redaction: str, message: str) -> str:
+        """Obfuscates the values of the fields in a log line."""
+        return self.pattern.sub(patterns["replace"](redaction), message)
+
+
+class TokenRedactor:
+    """Redaction engine splitting a log line on its separator once.
+
+    Produces the same output as the regex engine for literal field
+    names that do not contain the separator or an equal sign.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], separator: str):
+        self.fields = frozenset(fields)
+        self.separator = separator
+        self.lengths = sorted({len(field) for field in self.fields})
+
+    def _is_field_key(self, segment: str, pos: int) -> bool:
+        """Checks if the text before an equal sign ends with a field."""
+        for n in self.lengths:
+            if n > pos:
+                return False
+            if segment[pos - n:pos] in self.fields:
+                return True
+        return False
+
+    def redact(self, redaction: str, message: str) -> str:
+        """Obfuscates the values of the fields in a log line."""
+        segments = message.split(self.separator)
+        for i, segment in enumerate(segments):
+            pos = segment.find('=')
+            while pos != -1 and not self._is_field_key(segment, pos):
+                pos = segment.find('=', pos + 1)
+            if pos != -1:
+                segments[i] = segment[:pos + 1] + redaction
+        return self.separator.join(segments)
+
+
+REDACTION_MODES = {
+    'regex': Redactor,
+    'token': TokenRedactor,
+}
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def _cached_redactor(
+        fields: Tuple[str, ...], separator: str,
+        mode: str) -> Union[Redactor, TokenRedactor]:
+    """Builds the redactor for a field set and separator."""
+    return REDACTION_MODES[mode](fields, separator)
+
+
+def get_redactor(
+        fields: List[str], separator: str,
+        mode: str = 'regex') -> Union[Redactor, TokenRedactor]:
+    """Retrieves the cached redactor for a field set and separator."""
+    if mode not in REDACTION_MODES:
+        raise ValueError("Unknown redaction mode: {}".format(mode))
+    return _cached_redactor(tuple(fields), separator, mode)
 
 
 def filter_datum(
         fields: List[str], redaction: str, message: str,
         separator: str) -> str:
     """Filters a log line."""
-    extract, replace = (patterns["extract"], patterns["replace"])
-    return re.sub(extract(fields, separator), replace(redaction), message)
+    return get_redactor(fields, separator).redact(redaction, message)
 
 
-def get_logger() -> logging.Logger:
-    """Creates a new logger for user data."""
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler applying an overflow policy to a bounded queue."""
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = 'block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        super(BoundedQueueHandler, self).__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Puts a record on the queue, dropping one if it is full."""
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            self.dropped += 1
+        if self.overflow == 'count':
+            return
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener formatting and writing records in batches."""
+
+    def stop(self) -> None:
+        """Flushes the pending records and stops the listener once."""
+        if self._thread is not None:
+            super(BatchingQueueListener, self).stop()
+
+    def enqueue_sentinel(self) -> None:
+        """Waits for room on a bounded queue to signal the stop."""
+        self.queue.put(self._sentinel)
+
+    def handle_batch(self, records: List[logging.LogRecord]) -> None:
+        """Writes a batch of records with one flush per handler."""
+        for handler in self.handlers:
+            lines = [handler.format(record) for record in records
+                     if record.levelno >= handler.level
+                     and handler.filter(record)]
+            if not lines:
+                continue
+            terminator = handler.terminator
+            with handler.lock:
+                handler.stream.write(terminator.join(lines) + terminator)
+                handler.flush()
+
+    def _monitor(self) -> None:
+        """Drains the queue in batches until the stop sentinel."""
+        has_task_done = hasattr(self.queue, 'task_done')
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not self._sentinel]
+            if records:
+                self.handle_batch(records)
+            if has_task_done:
+                for _ in batch:
+                    self.queue.task_done()
+            if len(records) < len(batch):
+                break
+
+
+def get_logger(queued: bool = False, stream: TextIO = None) -> logging.Logger:
+    """Creates a new logger for user data.
+
+    A queued logger only enqueues records on the calling thread while a
+    background listener redacts and writes them.
+    """
     logger = logging.getLogger("user_data")
-    stream_handler = logging.StreamHandler()
+    stream_handler = logging.StreamHandler(stream)
     stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    logger.addHandler(stream_handler)
+    if not queued:
+        logger.addHandler(stream_handler)
+        return logger
+    try:
+        queue_size = int(os.getenv(
+            "PERSONAL_DATA_LOG_QUEUE_SIZE", DEFAULT_LOG_QUEUE_SIZE))
+    except ValueError:
+        queue_size = DEFAULT_LOG_QUEUE_SIZE
+    overflow = os.getenv("PERSONAL_DATA_LOG_OVERFLOW", "block")
+    log_queue = queue.Queue(max(queue_size, 1))
+    queue_handler = BoundedQueueHandler(log_queue, overflow)
+    queue_handler.listener = BatchingQueueListener(log_queue, stream_handler)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    logger.addHandler(queue_handler)
     return logger
 
 
@@ -51,23 +239,293 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return connection
 
 
+class PooledConnection:
+    """Database connection handed out by a ConnectionPool.
+
+    Closing it, or leaving its `with` block, returns the underlying
+    connection to the pool.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection, name)
+
+    def __enter__(self) -> 'PooledConnection':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Gives the connection back to its pool."""
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+
+class ConnectionPool:
+    """Bounded pool of database connections."""
+
+    def __init__(self, connect: Callable, size: int = DEFAULT_POOL_SIZE,
+                 idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT,
+                 ping: bool = True):
+        self.connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.ping = ping
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.borrowed = 0
+        self.borrows = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def _is_usable(self, connection, released_at: float) -> bool:
+        """Checks an idle connection before handing it out again."""
+        if time.monotonic() - released_at > self.idle_timeout:
+            return False
+        if not self.ping:
+            return True
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, connection) -> None:
+        """Closes a connection that left the pool for good."""
+        with self._lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _take_idle(self):
+        """Pops the most recently released usable connection."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, released_at = self._idle.pop()
+            if self._is_usable(connection, released_at):
+                return connection
+            self._discard(connection)
+
+    def acquire(self) -> PooledConnection:
+        """Borrows a connection, waiting for one if the pool is full."""
+        start = time.monotonic()
+        self._slots.acquire()
+        waited = time.monotonic() - start
+        try:
+            connection = self._take_idle()
+            reused = connection is not None
+            if not reused:
+                connection = self.connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.borrowed += 1
+            self.borrows += 1
+            self.reused += reused
+            self.created += not reused
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+        return PooledConnection(self, connection)
+
+    def release(self, connection) -> None:
+        """Puts a borrowed connection back into the pool.
+
+        Its open transaction is rolled back first, so the next borrower
+        neither reads from an old snapshot nor inherits uncommitted
+        writes. A connection failing the rollback is discarded.
+        """
+        try:
+            connection.rollback()
+            usable = True
+        except Exception:
+            usable = False
+        with self._lock:
+            if usable:
+                self._idle.append((connection, time.monotonic()))
+            self.borrowed -= 1
+        if not usable:
+            self._discard(connection)
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """Reports the pool usage counters."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "borrowed": self.borrowed,
+                "idle": len(self._idle),
+                "borrows": self.borrows,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "wait_time": self.wait_time,
+                "max_wait": self.max_wait,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Retrieves the process-wide pool of database connections."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            try:
+                size = int(os.getenv(
+                    "PERSONAL_DATA_DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+                idle_timeout = float(os.getenv(
+                    "PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT",
+                    DEFAULT_POOL_IDLE_TIMEOUT))
+            except ValueError:
+                size, idle_timeout = (
+                    DEFAULT_POOL_SIZE, DEFAULT_POOL_IDLE_TIMEOUT)
+            ping = os.getenv("PERSONAL_DATA_DB_POOL_PING", "1") != "0"
+            _pool = ConnectionPool(get_db, max(size, 1), idle_timeout, ping)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def get_pooled_db() -> PooledConnection:
+    """Borrows a connector to the database from the process-wide pool."""
+    return get_pool().acquire()
+
+
+def get_batch_size() -> int:
+    """Retrieves the number of rows fetched per round trip."""
+    try:
+        batch_size = int(os.getenv(
+            "PERSONAL_DATA_DB_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    except ValueError:
+        batch_size = DEFAULT_BATCH_SIZE
+    return batch_size if batch_size > 0 else DEFAULT_BATCH_SIZE
+
+
+def stream_rows(cursor, batch_size: int) -> Iterator[tuple]:
+    """Yields the rows of an executed query one batch at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def format_rows(
+        fields: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    """Yields the log message of each user record."""
+    for row in rows:
+        record = '; '.join('{}={}'.format(col, val) for col, val in zip(
+            fields, row))
+        yield '{};'.format(record)
+
+
+def make_log_record(msg: str) -> logging.LogRecord:
+    """Wraps a user record message into a LogRecord."""
+    args = ("user_data", logging.INFO, None, None, msg, None, None)
+    return logging.LogRecord(*args)
+
+
+def log_messages(logger: logging.Logger, messages: Iterable[str]) -> None:
+    """Logs each message through the given logger."""
+    for msg in messages:
+        logger.handle(make_log_record(msg))
+
+
+def get_shard_ranges(
+        connection, key: str, shards: int) -> List[Tuple[int, int]]:
+    """Splits the users table into half-open primary key ranges."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MIN({0}), MAX({0}) FROM users;".format(key))
+        low, high = cursor.fetchone()
+    if low is None:
+        return []
+    step = (high - low) // shards + 1
+    return [(start, min(start + step, high + 1))
+            for start in range(low, high + 1, step)]
+
+
+def export_shard(shard: Tuple[str, int, int, Callable, str]) -> str:
+    """Redacts the user records of a key range into a file of a directory.
+    """
+    key, low, high, connect, shard_dir = shard
+    formatter = RedactingFormatter(PII_FIELDS)
+    query = "SELECT {} FROM users WHERE {} >= %s AND {} < %s ORDER BY {};"
+    fd, shard_path = tempfile.mkstemp(
+        prefix="user_data_", suffix=".log", dir=shard_dir)
+    connection = connect()
+    try:
+        with os.fdopen(fd, 'w') as out, \
+                connection.cursor(buffered=False) as cursor:
+            cursor.execute(query.format(
+                ','.join(USER_FIELDS), key, key, key), (low, high))
+            rows = stream_rows(cursor, get_batch_size())
+            for msg in format_rows(USER_FIELDS, rows):
+                out.write(formatter.format(make_log_record(msg)) + '\n')
+    finally:
+        connection.close()
+    return shard_path
+
+
+def export_sharded(
+        workers: int = None, sink: TextIO = None, key: str = None,
+        connect: Callable = get_db) -> None:
+    """Redacts the users table in parallel, one process per key range.
+
+    Shards are written to the sink in key order. They go through a
+    private temporary directory, removed even if the export fails, as
+    they hold the fields that aren't redacted.
+    """
+    workers = workers or os.cpu_count() or 1
+    sink = sink or sys.stderr
+    key = key or os.getenv("PERSONAL_DATA_DB_SHARD_KEY", "id")
+    connection = connect()
+    ranges = get_shard_ranges(connection, key, workers * SHARDS_PER_WORKER)
+    connection.close()
+    shard_dir = tempfile.mkdtemp(prefix="user_data_")
+    try:
+        shards = [(key, low, high, connect, shard_dir)
+                  for low, high in ranges]
+        with multiprocessing.Pool(workers) as pool:
+            for shard_path in pool.imap(export_shard, shards):
+                with open(shard_path) as shard_file:
+                    shutil.copyfileobj(shard_file, sink)
+                os.remove(shard_path)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    sink.flush()
+
+
 def main():
     """Logs the information about user records in a table."""
-    fields = [
-            "name", "email", "phone", "ssn", "password", "ip",
-            "last_login", "user_agent"]
+    try:
+        workers = int(os.getenv("PERSONAL_DATA_EXPORT_WORKERS", "1"))
+    except ValueError:
+        workers = 1
+    if workers > 1:
+        export_sharded(workers)
+        return
     info_logger = get_logger()
     connection = get_db()
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT {} FROM users;".format(','.join(fields)))
-        rows = cursor.fetchall()
-        for row in rows:
-            record = '; '.join('{}={}'.format(col, val) for col, val in zip(
-                fields, row))
-            msg = '{};'.format(record)
-            args = ("user_data", logging.INFO, None, None, msg, None, None)
-            log_record = logging.LogRecord(*args)
-            info_logger.handle(log_record)
+    with connection.cursor(buffered=False) as cursor:
+        cursor.execute("SELECT {} FROM users;".format(','.join(USER_FIELDS)))
+        rows = stream_rows(cursor, get_batch_size())
+        log_messages(info_logger, format_rows(USER_FIELDS, rows))
+    connection.close()
 
 
 class RedactingFormatter(logging.Formatter):
@@ -77,14 +535,15 @@ class RedactingFormatter(logging.Formatter):
     FORMAT_FIELDS = ('name', 'levelname', 'asctime', 'message')
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], mode: str = 'regex'):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = get_redactor(fields, self.SEPARATOR, mode)
 
     def format(self, record: logging.LogRecord) -> str:
         """Formats a LogRecord."""
         msg = super(RedactingFormatter, self).format(record)
-        txt = filter_datum(self.fields, self.REDACTION, msg, self.SEPARATOR)
+        txt = self.redactor.redact(self.REDACTION, msg)
         return txt
 
 
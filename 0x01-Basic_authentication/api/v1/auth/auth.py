@@ -2,27 +2,44 @@
 """Authentication module for the API.
 """
 import re
-from typing import List, TypeVar
+from typing import List, Pattern, Tuple, TypeVar
 from flask import request
 
 
+def compile_exclusions(excluded_paths: Tuple[str, ...]) -> Pattern:
+    """Combines exclusion paths into one regex, or None if there are none.
+    """
+    patterns = []
+    for exclusion_path in map(lambda x: x.strip(), excluded_paths):
+        if exclusion_path == '':
+            continue
+        if exclusion_path[-1] == '*':
+            pattern = '{}.*'.format(exclusion_path[0:-1])
+        elif exclusion_path[-1] == '/':
+            pattern = '{}/*'.format(exclusion_path[0:-1])
+        else:
+            pattern = '{}/*'.format(exclusion_path)
+        patterns.append('(?:{})'.format(pattern))
+    if len(patterns) == 0:
+        return None
+    return re.compile('|'.join(patterns))
+
+
 class Auth:
     """Authentication class.
     """
+    _exclusions = ((), None)
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """Checks if a path requires authentication.
         """
         if path is not None and excluded_paths is not None:
-            for exclusion_path in map(lambda x: x.strip(), excluded_paths):
-                pattern = ''
-                if exclusion_path[-1] == '*':
-                    pattern = '{}.*'.format(exclusion_path[0:-1])
-                elif exclusion_path[-1] == '/':
-                    pattern = '{}/*'.format(exclusion_path[0:-1])
-                else:
-                    pattern = '{}/*'.format(exclusion_path)
-                if re.match(pattern, path):
-                    return False
+            key = tuple(excluded_paths)
+            if key != self._exclusions[0]:
+                self._exclusions = (key, compile_exclusions(key))
+            matcher = self._exclusions[1]
+            if matcher is not None and matcher.match(path):
+                return False
         return True
 
     def authorization_header(self, request=None) -> str:
@@ -5,6 +5,7 @@
 
 import base64
 from api.v1.auth.auth import Auth
+from models.user import User
 
 
 class BasicAuth(Auth):
@@ -87,7 +88,7 @@ class BasicAuth(Auth):
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
 
-        users = self.search_users({'email': user_email})
+        users = User.search({'email': user_email})
         if not users:
             return None
 
@@ -10,11 +10,34 @@ import uuid
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+
+
+def _index_add(obj: TypeVar('Base')):
+    """ Add a stored object to the indexes of its class
+    """
+    indexes = INDEXES[obj.__class__.__name__]
+    for attr in obj.indexed_attributes:
+        bucket = indexes[attr].setdefault(getattr(obj, attr, None), {})
+        bucket[obj.id] = obj
+
+
+def _index_remove(obj: TypeVar('Base')):
+    """ Remove a stored object from the indexes of its class
+    """
+    indexes = INDEXES[obj.__class__.__name__]
+    for attr in obj.indexed_attributes:
+        value = getattr(obj, attr, None)
+        bucket = indexes[attr].get(value, {})
+        bucket.pop(obj.id, None)
+        if len(bucket) == 0:
+            indexes[attr].pop(value, None)
 
 
 class Base():
     """ Base class
     """
+    indexed_attributes = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -22,6 +45,7 @@ class Base():
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+            INDEXES[s_class] = {a: {} for a in self.indexed_attributes}
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -35,6 +59,22 @@ class Base():
         else:
             self.updated_at = datetime.utcnow()
 
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, keeping the indexes of stored objects current
+        """
+        if name not in self.indexed_attributes or not self._is_stored():
+            super().__setattr__(name, value)
+            return
+        _index_remove(self)
+        super().__setattr__(name, value)
+        _index_add(self)
+
+    def _is_stored(self) -> bool:
+        """ Check if this instance is the one stored in DATA
+        """
+        s_class = self.__class__.__name__
+        return DATA[s_class].get(getattr(self, 'id', None)) is self
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -64,13 +104,16 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
+        INDEXES[s_class] = {a: {} for a in cls.indexed_attributes}
         if not path.exists(file_path):
             return
 
         with open(file_path, 'r') as f:
             objs_json = json.load(f)
             for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+                obj = cls(**obj_json)
+                DATA[s_class][obj_id] = obj
+                _index_add(obj)
 
     @classmethod
     def save_to_file(cls):
@@ -90,7 +133,11 @@ class Base():
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
+        if not self._is_stored():
+            if DATA[s_class].get(self.id) is not None:
+                _index_remove(DATA[s_class][self.id])
+            DATA[s_class][self.id] = self
+            _index_add(self)
         self.__class__.save_to_file()
 
     def remove(self):
@@ -98,7 +145,7 @@ class Base():
         """
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
+            _index_remove(DATA[s_class].pop(self.id))
             self.__class__.save_to_file()
 
     @classmethod
@@ -124,8 +171,16 @@ class Base():
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        Uses the index of the first indexed attribute of the query, if any
         """
         s_class = cls.__name__
+        candidates = DATA[s_class].values()
+        for k, v in attributes.items():
+            if k in cls.indexed_attributes:
+                candidates = INDEXES[s_class][k].get(v, {}).values()
+                break
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +188,5 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        return list(filter(_search, candidates))
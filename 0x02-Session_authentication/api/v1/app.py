@@ -3,8 +3,9 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.context import get_auth_context
 from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, request, g
 from flask_cors import (CORS, cross_origin)
 import os
 
@@ -14,6 +15,13 @@ app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 AUTH_TYPE = os.getenv("AUTH_TYPE")
+AUTH_TIMING = os.getenv("AUTH_TIMING", "0") == "1"
+EXCLUDED_PATHS = [
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+]
 if AUTH_TYPE == "auth":
     from api.v1.auth.auth import Auth
     auth = Auth()
@@ -39,21 +47,25 @@ def bef_req():
     if auth is None:
         pass
     else:
-        setattr(request, "current_user", auth.current_user(request))
-        excluded = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-            '/api/v1/auth_session/login/'
-        ]
-        if auth.require_auth(request.path, excluded):
-            cookie = auth.session_cookie(request)
-            if auth.authorization_header(request) is None and cookie is None:
+        context = get_auth_context(auth, request)
+        setattr(request, "current_user", context.user)
+        if context.require_auth(EXCLUDED_PATHS):
+            if not context.has_credentials():
                 abort(401, description="Unauthorized")
-            if auth.current_user(request) is None:
+            if context.user is None:
                 abort(403, description="Forbidden")
 
 
+@app.after_request
+def aft_req(response):
+    """
+    Report the time spent in each authentication phase, if enabled
+    """
+    if AUTH_TIMING and 'auth_context' in g:
+        response.headers['Server-Timing'] = g.auth_context.server_timing()
+    return response
+
+
 @app.errorhandler(404)
 def not_found(error) -> str:
     """ Not found handler
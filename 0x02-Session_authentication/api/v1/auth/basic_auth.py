@@ -4,7 +4,110 @@
 
 
 import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
 from api.v1.auth.auth import Auth
+from models.user import User
+
+
+class CredentialCache:
+    """
+    Bounded cache of the users whose Basic credentials were verified.
+
+    Entries are keyed by an HMAC of the raw Authorization header under a
+    per-process secret, so the cache never holds a usable credential.
+    They expire after `ttl` seconds and are dropped as soon as their
+    user is saved or removed in this process. BasicAuth checks a hit
+    against the stored user for changes made by other processes.
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        """
+        Initializes an empty cache.
+
+        :param size: Maximum number of entries, 0 disables the cache.
+        :param ttl: Lifetime of an entry in seconds.
+        """
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    def _key(self, authorization_header: str) -> bytes:
+        """
+        Keyed hash of an Authorization header.
+        """
+        return hmac.new(self._secret, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def _drop(self, key: bytes) -> None:
+        """
+        Removes one entry, the lock being held.
+        """
+        user, _ = self._entries.pop(key)
+        keys = self._keys_by_user[user.id]
+        keys.discard(key)
+        if len(keys) == 0:
+            del self._keys_by_user[user.id]
+
+    def get(self, authorization_header: str) -> 'User':
+        """
+        Retrieves the user verified for a header, if still fresh.
+        """
+        if self.size <= 0:
+            return None
+        key = self._key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, authorization_header: str, user: 'User',
+            invalidations: int) -> None:
+        """
+        Records the user verified for a header.
+
+        :param invalidations: Value of `invalidations` before the user
+            was verified; the entry is not recorded if a user was saved
+            or removed in the meantime.
+        """
+        if self.size <= 0:
+            return
+        key = self._key(authorization_header)
+        with self._lock:
+            if invalidations != self.invalidations:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user.id, set()).add(key)
+            if len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, op: str, user: 'User') -> None:
+        """
+        Drops every entry of a user, called when it's saved or removed.
+        """
+        with self._lock:
+            self.invalidations += 1
+            for key in list(self._keys_by_user.get(user.id, ())):
+                self._drop(key)
 
 
 class BasicAuth(Auth):
@@ -12,6 +115,16 @@ class BasicAuth(Auth):
     BasicAuth class inherits from Auth.
     """
 
+    def __init__(self) -> None:
+        """
+        Initializes the verified-credential cache.
+        """
+        super().__init__()
+        self.credential_cache = CredentialCache(
+            int(os.getenv('BASIC_AUTH_CACHE_SIZE', '1024')),
+            float(os.getenv('BASIC_AUTH_CACHE_TTL', '60')))
+        User.add_listener(self.credential_cache.invalidate)
+
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
         """
@@ -87,7 +200,7 @@ class BasicAuth(Auth):
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
 
-        users = self.search_users({'email': user_email})
+        users = User.search({'email': user_email})
         if not users:
             return None
 
@@ -110,6 +223,16 @@ class BasicAuth(Auth):
         if authorization_header is None:
             return None
 
+        cache = self.credential_cache
+        user = cache.get(authorization_header)
+        if user is not None:
+            current = User.get(user.id)
+            if current is not None and current.email == user.email and \
+                    current._password == user._password:
+                return current
+            cache.invalidate("stale", user)
+        invalidations = cache.invalidations
+
         base64_auth_header = self.extract_base64_authorization_header(
                 authorization_header)
         if base64_auth_header is None:
@@ -125,4 +248,7 @@ class BasicAuth(Auth):
         if user_email is None or user_pwd is None:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            cache.put(authorization_header, user, invalidations)
+        return user
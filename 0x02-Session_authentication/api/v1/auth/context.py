@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Per-request authentication context module.
+"""
+import time
+from typing import Callable, List, TypeVar
+from flask import g
+
+
+_UNRESOLVED = object()
+
+
+class AuthContext:
+    """Authentication state of one request, each part resolved once.
+    """
+
+    def __init__(self, auth, request) -> None:
+        """Initializes the context of a request.
+        """
+        self.auth = auth
+        self.request = request
+        self.timings = {}
+        self._user = _UNRESOLVED
+
+    def _timed(self, phase: str, func: Callable, *args):
+        """Calls func and records its duration in milliseconds.
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0) + (
+                time.perf_counter() - start) * 1000
+
+    def require_auth(self, excluded_paths: List[str]) -> bool:
+        """Checks if the request path requires authentication.
+        """
+        return self._timed('require', self.auth.require_auth,
+                           self.request.path, excluded_paths)
+
+    def has_credentials(self) -> bool:
+        """Checks if the request carries a header or session cookie.
+        """
+        def credentials():
+            return (self.auth.authorization_header(self.request)
+                    is not None or
+                    self.auth.session_cookie(self.request) is not None)
+        return self._timed('credentials', credentials)
+
+    @property
+    def user(self) -> TypeVar('User'):
+        """Gets the current user, resolved on first access only.
+        """
+        if self._user is _UNRESOLVED:
+            self._user = self._timed('user', self.auth.current_user,
+                                     self.request)
+        return self._user
+
+    def server_timing(self) -> str:
+        """Formats the phase durations as a Server-Timing header value.
+        """
+        return ', '.join('auth_{};dur={:.3f}'.format(phase, duration)
+                         for phase, duration in self.timings.items())
+
+
+def get_auth_context(auth, request) -> AuthContext:
+    """Gets the context of the current request, kept on flask.g.
+    """
+    if 'auth_context' not in g:
+        g.auth_context = AuthContext(auth, request)
+    return g.auth_context
@@ -6,6 +6,7 @@ from uuid import uuid4
 from flask import request
 
 from .auth import Auth
+from models.base import get_driver
 from models.user import User
 
 
@@ -13,7 +14,7 @@ class SessionAuth(Auth):
     """Class for session-based authentication.
     """
 
-    user_id_by_session_id = {}
+    user_id_by_session_id = get_driver().mapping("user_id_by_session_id")
 
     def create_session(self, user_id: str = None) -> str:
         """Generates a session ID for the user.
@@ -42,6 +43,5 @@ class SessionAuth(Auth):
         user_id = self.user_id_for_session_id(session_id)
         if (request is None or session_id is None) or user_id is None:
             return False
-        if session_id in self.user_id_by_session_id:
-            del self.user_id_by_session_id[session_id]
+        self.user_id_by_session_id.pop(session_id, None)
         return True
@@ -2,7 +2,12 @@
 """
 Define class SessionDButh
 """
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
 from .session_exp_auth import SessionExpAuth
+from models.session_store import SessionStore
+from models.user import User
 from models.user_session import UserSession
 
 
@@ -12,21 +17,66 @@ class SessionDBAuth(SessionExpAuth):
     in a database
     """
 
+    def __init__(self) -> None:
+        """
+        Open the session store, then schedule the expiry of its sessions
+        """
+        self.session_store = SessionStore()
+        super().__init__()
+        User.add_listener(self._on_user_change)
+
+    def _on_user_change(self, op: str, user: User) -> None:
+        """
+        Log a removed user out of all devices
+        """
+        if op == "remove":
+            self.destroy_user_sessions(user.id)
+
+    def _session_times(self):
+        """
+        Yields the ID and creation time of each stored session
+        """
+        for user_session in self.session_store.all():
+            yield user_session.session_id, user_session.created_at
+
+    def _expiry(self, created_at: datetime) -> float:
+        """
+        Expiry time of a session, whose created_at is in UTC
+        """
+        expires_at = created_at + timedelta(seconds=self.session_duration)
+        return expires_at.replace(tzinfo=timezone.utc).timestamp()
+
+    def _evict(self, session_id: str, created_at: datetime) -> bool:
+        """
+        Removes a session if it's still the one created at created_at
+
+        Drivers storing timestamps as text keep whole seconds only
+        """
+        user_session = self.session_store.get(session_id)
+        if user_session is None or user_session.created_at.replace(
+                microsecond=0) != created_at.replace(microsecond=0):
+            return False
+        return self.session_store.remove(session_id) is not None
+
+    def _live_sessions(self) -> int:
+        """
+        Counts the stored sessions
+        """
+        return self.session_store.count()
+
     def create_session(self, user_id=None):
         """
         Create a Session ID for a user_id
         Args:
            user_id (str): user id
         """
-        session_id = super().create_session(user_id)
-        if not session_id:
+        if type(user_id) is not str:
             return None
-        kw = {
-            "user_id": user_id,
-            "session_id": session_id
-        }
-        user = UserSession(**kw)
-        user.save()
+        session_id = str(uuid4())
+        user_session = UserSession(user_id=user_id, session_id=session_id)
+        self.session_store.add(user_session)
+        if self.session_duration > 0:
+            self._schedule(session_id, user_session.created_at)
         return session_id
 
     def user_id_for_session_id(self, session_id=None):
@@ -35,12 +85,18 @@ class SessionDBAuth(SessionExpAuth):
         Args:
             session_id (str): session ID
         Return:
-            user id or None if session_id is None or not a string
+            user id or None if session_id is None, unknown or expired
         """
-        user_id = UserSession.search({"session_id": session_id})
-        if user_id:
-            return user_id
-        return None
+        if type(session_id) is not str:
+            return None
+        user_session = self.session_store.get(session_id)
+        if user_session is None:
+            return None
+        if self.session_duration > 0:
+            time_span = timedelta(seconds=self.session_duration)
+            if user_session.created_at + time_span < datetime.utcnow():
+                return None
+        return user_session.user_id
 
     def destroy_session(self, request=None):
         """
@@ -52,8 +108,14 @@ class SessionDBAuth(SessionExpAuth):
         session_id = self.session_cookie(request)
         if not session_id:
             return False
-        user_session = UserSession.search({"session_id": session_id})
-        if user_session:
-            user_session[0].remove()
-            return True
-        return False
+        return self.session_store.remove(session_id) is not None
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """
+        Destroy every session of a user, logging it out of all devices
+        Args:
+            user_id (str): user id
+        Return:
+            number of sessions destroyed
+        """
+        return self.session_store.remove_user(user_id)
@@ -2,15 +2,54 @@
 """Module implementing session authentication with expiration for the API.
 """
 
+import heapq
+import logging
 import os
+import threading
+import time
+from uuid import uuid4
 from flask import request
 from datetime import datetime, timedelta
 
 from .session_auth import SessionAuth
 
+SWEEP_RETRIES = 3
+
+
+class SessionSweeper(threading.Thread):
+    """Background thread evicting expired sessions.
+    """
+
+    def __init__(self, auth: 'SessionExpAuth', interval: float) -> None:
+        """Initializes a sweeper calling `auth.sweep` every `interval` s.
+        """
+        super().__init__(name="session-sweeper", daemon=True)
+        self.auth = auth
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        """Sweeps until stopped, logging the errors of a failed sweep.
+        """
+        while not self.stopped.wait(self.interval):
+            try:
+                self.auth.sweep()
+            except Exception:
+                self.auth.sweep_errors += 1
+                logging.getLogger(__name__).exception("Session sweep failed")
+
+    def stop(self) -> None:
+        """Stops sweeping.
+        """
+        self.stopped.set()
+
 
 class SessionExpAuth(SessionAuth):
     """Session authentication class with expiration.
+
+    Expiry times are kept in a min-heap, so the sweeper only touches the
+    sessions that are due. A forked child gets its own sweeper, since
+    threads don't survive fork.
     """
 
     def __init__(self) -> None:
@@ -21,31 +60,145 @@ class SessionExpAuth(SessionAuth):
             self.session_duration = int(os.getenv('SESSION_DURATION', '0'))
         except Exception:
             self.session_duration = 0
+        self.evictions = 0
+        self.sweep_errors = 0
+        self._expiries = []
+        self._expiries_lock = threading.Lock()
+        self.sweeper = None
+        if self.session_duration > 0:
+            for session_id, created_at in self._session_times():
+                self._schedule(session_id, created_at)
+            self._start_sweeper()
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_sweeper(self) -> None:
+        """Starts the thread evicting expired sessions.
+        """
+        self.sweeper = SessionSweeper(self, float(os.getenv(
+            'SESSION_SWEEP_INTERVAL', '1')))
+        self.sweeper.start()
+
+    def _after_fork(self) -> None:
+        """Restarts sweeping in a forked child.
+
+        The lock is replaced in case another thread held it at fork.
+        """
+        self._expiries_lock = threading.Lock()
+        self._start_sweeper()
+
+    def _session_times(self):
+        """Yields the ID and creation time of each stored session.
+        """
+        for session_id in list(self.user_id_by_session_id):
+            session_dict = self.user_id_by_session_id.get(session_id)
+            if type(session_dict) is dict and 'created_at' in session_dict:
+                yield session_id, session_dict['created_at']
+
+    def _expiry(self, created_at: datetime) -> float:
+        """Gets the expiry time of a session as a timestamp.
+        """
+        expires_at = created_at + timedelta(seconds=self.session_duration)
+        return expires_at.timestamp()
+
+    def _schedule(self, session_id: str, created_at: datetime) -> None:
+        """Adds a session to the expiry heap.
+        """
+        with self._expiries_lock:
+            heapq.heappush(self._expiries, (
+                self._expiry(created_at), session_id, created_at, 0))
+
+    def _evict(self, session_id: str, created_at: datetime) -> bool:
+        """Removes a session if it's still the one created at created_at.
+        """
+        session_dict = self.user_id_by_session_id.get(session_id)
+        if type(session_dict) is not dict or \
+                session_dict.get('created_at') != created_at:
+            return False
+        try:
+            del self.user_id_by_session_id[session_id]
+        except KeyError:
+            return False
+        return True
+
+    def _live_sessions(self) -> int:
+        """Counts the stored sessions.
+        """
+        return len(self.user_id_by_session_id)
+
+    def sweep(self) -> int:
+        """Evicts the sessions that expired, returning how many.
+
+        Due sessions are taken off the heap under the lock but evicted
+        after releasing it, so logins don't wait for the evictions. A
+        failed eviction is logged and retried on the next sweeps, up to
+        SWEEP_RETRIES attempts.
+        """
+        now = time.time()
+        due = []
+        with self._expiries_lock:
+            while self._expiries and self._expiries[0][0] < now:
+                due.append(heapq.heappop(self._expiries))
+        evicted = 0
+        retries = []
+        for expires_at, session_id, created_at, attempts in due:
+            try:
+                evicted += self._evict(session_id, created_at)
+            except Exception:
+                self.sweep_errors += 1
+                logging.getLogger(__name__).exception(
+                    "Evicting session %s failed", session_id)
+                if attempts + 1 < SWEEP_RETRIES:
+                    retries.append(
+                        (expires_at, session_id, created_at, attempts + 1))
+        with self._expiries_lock:
+            for entry in retries:
+                heapq.heappush(self._expiries, entry)
+            self.evictions += evicted
+        return evicted
+
+    def stats(self) -> dict:
+        """Counts live sessions, pending expiries, evictions and failed
+        sweeps so far.
+        """
+        return {
+            'live_sessions': self._live_sessions(),
+            'pending_expiries': len(self._expiries),
+            'evictions': self.evictions,
+            'sweep_errors': self.sweep_errors,
+        }
 
     def create_session(self, user_id=None):
         """Create a session ID for the user.
+
+        The session is stored once, already holding its creation time.
         """
-        session_id = super().create_session(user_id)
-        if type(session_id) != str:
+        if type(user_id) is not str:
             return None
-        self.user_id_by_session_id[session_id] = {
+        session_id = str(uuid4())
+        session_dict = {
             'user_id': user_id,
             'created_at': datetime.now(),
         }
+        self.user_id_by_session_id[session_id] = session_dict
+        if self.session_duration > 0:
+            self._schedule(session_id, session_dict['created_at'])
         return session_id
 
     def user_id_for_session_id(self, session_id=None) -> str:
         """Retrieve the user ID associated with a given session ID.
         """
-        if session_id in self.user_id_by_session_id:
-            session_dict = self.user_id_by_session_id[session_id]
-            if self.session_duration <= 0:
-                return session_dict['user_id']
-            if 'created_at' not in session_dict:
-                return None
-            cur_time = datetime.now()
-            time_span = timedelta(seconds=self.session_duration)
-            exp_time = session_dict['created_at'] + time_span
-            if exp_time < cur_time:
-                return None
+        if type(session_id) is not str:
+            return None
+        session_dict = self.user_id_by_session_id.get(session_id)
+        if type(session_dict) is not dict:
+            return None
+        if self.session_duration <= 0:
             return session_dict['user_id']
+        if 'created_at' not in session_dict:
+            return None
+        cur_time = datetime.now()
+        time_span = timedelta(seconds=self.session_duration)
+        exp_time = session_dict['created_at'] + time_span
+        if exp_time < cur_time:
+            return None
+        return session_dict['user_id']
@@ -2,18 +2,69 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, jsonify, request, Response, url_for
 from models.user import User
+import json
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NDJSON = 'application/x-ndjson'
+
+
+def _stream_users(after: str = None, limit: int = None):
+    """ Yield users as NDJSON lines, one page of them in memory at a time
+    """
+    sent = 0
+    while limit is None or sent < limit:
+        size = MAX_PAGE_SIZE
+        if limit is not None:
+            size = min(size, limit - sent)
+        users = User.page(size, after)
+        if len(users) == 0:
+            return
+        yield "".join(json.dumps(user.to_json()) + "\n" for user in users)
+        sent += len(users)
+        after = users[-1].id
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users, from 1 to 1000
+      - after: ID of the last user of the previous page
     Return:
       - list of all User objects JSON represented
+      - with limit or after, one page of users ordered by ID and a
+        Link header to the next page
+      - NDJSON stream of the users if the client accepts it
+      - 400 if limit is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': "limit must be between 1 and {}".format(
+                MAX_PAGE_SIZE)}), 400
+    accepted = request.accept_mimetypes.best_match(['application/json',
+                                                    NDJSON])
+    if accepted == NDJSON:
+        return Response(_stream_users(after, limit), mimetype=NDJSON)
+    if limit is None and after is None:
+        all_users = [user.to_json() for user in User.all()]
+        return jsonify(all_users)
+    limit = limit or DEFAULT_PAGE_SIZE
+    users = User.page(limit, after)
+    response = jsonify([user.to_json() for user in users])
+    if len(users) == limit:
+        response.headers['Link'] = '<{}>; rel="next"'.format(url_for(
+            'app_views.view_all_users', limit=limit, after=users[-1].id))
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
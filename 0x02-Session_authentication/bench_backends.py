@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Benchmark of the /api/v1/users views on each storage driver
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+USERS = 10000
+REQUESTS = 200
+
+
+def populate(count: int):
+    """ Store `count` users with the configured driver
+    """
+    from models.base import _store
+    from models.user import User
+    User.load_from_file()
+    for i in range(count):
+        user = User(id=str(i), email="user_{}@example.com".format(i))
+        user.password = "pwd"
+        if os.environ["BASE_STORAGE"] == "json":
+            _store(user)
+        else:
+            user.save()
+    User.save_to_file()
+
+
+def timed(name: str, func, number: int):
+    """ Print the mean latency of `func` over `number` calls
+    """
+    start = time.perf_counter()
+    for i in range(number):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print("{:>7} {:>18} {:>12.3f}".format(
+        os.environ["BASE_STORAGE"], name, elapsed / number * 1000))
+
+
+def measure():
+    """ Time each users view with the Flask test client
+    """
+    populate(USERS)
+    from api.v1.app import app
+    client = app.test_client()
+
+    def check(response, status: int = 200):
+        assert response.status_code == status, response.status_code
+
+    timed("GET /users", lambda i: check(client.get("/api/v1/users")), 5)
+    timed("GET /users/:id", lambda i: check(
+        client.get("/api/v1/users/{}".format(i * 37 % USERS))), REQUESTS)
+    timed("GET /stats", lambda i: check(client.get("/api/v1/stats")),
+          REQUESTS)
+    timed("POST /users", lambda i: check(client.post("/api/v1/users", json={
+        "email": "new_{}@example.com".format(i), "password": "pwd"}), 201),
+        REQUESTS)
+    timed("PUT /users/:id", lambda i: check(client.put(
+        "/api/v1/users/{}".format(i), json={"first_name": "F"})), REQUESTS)
+    timed("DELETE /users/:id", lambda i: check(
+        client.delete("/api/v1/users/{}".format(i))), REQUESTS)
+
+
+def main():
+    """ Run the views against every driver, each in a fresh process
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "measure":
+        measure()
+        return
+    here = os.path.dirname(os.path.abspath(__file__))
+    print("{:>7} {:>18} {:>12}".format("store", "view", "mean (ms)"))
+    for storage in ("json", "mmap", "sqlite"):
+        env = dict(os.environ, BASE_STORAGE=storage, PYTHONPATH=here)
+        env.pop("AUTH_TYPE", None)
+        subprocess.run([sys.executable, os.path.join(
+            here, "bench_backends.py"), "measure"], env=env, check=True,
+            cwd=tempfile.mkdtemp())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+""" Stress test of concurrent POST/DELETE and reads on /api/v1/users
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+THREADS = 64
+ROUNDS = 30
+
+
+def hammer(client, thread: int, errors: list):
+    """ Create, read, list and delete users, recording unexpected answers
+    """
+    for i in range(ROUNDS):
+        try:
+            response = client.post("/api/v1/users", json={
+                "email": "user_{}_{}@example.com".format(thread, i),
+                "password": "pwd"})
+            if response.status_code != 201:
+                errors.append(("POST", response.status_code))
+                continue
+            user_id = response.get_json()["id"]
+            for url in ("/api/v1/users/" + user_id, "/api/v1/users"):
+                response = client.get(url)
+                if response.status_code != 200:
+                    errors.append(("GET", url, response.status_code))
+            if i % 2 == 0:
+                response = client.delete("/api/v1/users/" + user_id)
+                if response.status_code != 200:
+                    errors.append(("DELETE", response.status_code))
+        except Exception as e:
+            errors.append(("exception", repr(e)))
+
+
+def check_consistency() -> list:
+    """ Compare DATA, the email and id indexes and the snapshot file
+    """
+    from models.base import DATA, INDEXES, ORDERS
+    from models.user import User
+    problems = []
+    users = DATA["User"]
+    indexed = {obj_id for bucket in INDEXES["User"]["email"].values()
+               for obj_id in bucket}
+    if indexed != set(users):
+        problems.append("email index differs from DATA")
+    if ORDERS["User"] != sorted(users):
+        problems.append("id order differs from DATA")
+    User.save_to_file()
+    with open(".db_User.json") as f:
+        if set(json.load(f)) != set(users):
+            problems.append("snapshot differs from DATA")
+    expected = THREADS * (ROUNDS - (ROUNDS + 1) // 2)
+    if len(users) != expected:
+        problems.append("{} users instead of {}".format(
+            len(users), expected))
+    return problems
+
+
+def main():
+    """ Run the threads against a fresh store and report failures
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, here)
+    sys.setswitchinterval(1e-5)
+    os.environ.pop("AUTH_TYPE", None)
+    from api.v1.app import app
+    errors = []
+    threads = [threading.Thread(target=hammer, args=(
+        app.test_client(), i, errors)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    problems = check_consistency()
+    print("{} threads x {} rounds in {:.1f}s, {} errors".format(
+        THREADS, ROUNDS, elapsed, len(errors)))
+    for error in errors[:10] + problems:
+        print("  ", error)
+    sys.exit(1 if errors or problems else 0)
+
+
+if __name__ == "__main__":
+    main()
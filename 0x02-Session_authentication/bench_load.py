@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+""" Benchmark of cold start time of User.load_from_file
+"""
+from datetime import datetime
+import json
+import os
+import tempfile
+import time
+import uuid
+from models.base import DATA, TIMESTAMP_FORMAT, _store, _write_snapshot
+from models.user import User
+
+
+def legacy_load():
+    """ Load users by calling the constructor with strptime parsing
+    """
+    with open(".db_User.json", 'r') as f:
+        objs_json = json.load(f)
+    users = {}
+    for obj_id, obj_json in objs_json.items():
+        str(uuid.uuid4())
+        for key in ('created_at', 'updated_at'):
+            datetime.strptime(obj_json[key], TIMESTAMP_FORMAT)
+        users[obj_id] = User(**obj_json)
+    return users
+
+
+def timed(func) -> float:
+    """ Run a function once and return its duration in seconds
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    """ Print the startup time before and after at 1M users
+    """
+    count = 1000000
+    os.chdir(tempfile.mkdtemp())
+    User.load_from_file()
+    for i in range(count):
+        user = User(email="user_{}@example.com".format(i))
+        user.password = "pwd"
+        _store(user)
+    _write_snapshot('User')
+    DATA['User'] = {}
+    print("users:  {:,}".format(count))
+    print("before: {:.1f}s".format(timed(legacy_load)))
+    print("after:  {:.1f}s".format(timed(User.load_from_file)))
+    assert User.count() == count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+""" Benchmark of startup time and resident memory per storage backend
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def rss_mb() -> float:
+    """ Resident set size of this process in megabytes
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def populate(count: int):
+    """ Write the same users to a JSON snapshot and a memory-mapped store
+    """
+    from models.base import _store, _write_snapshot
+    from models.mmap_store import MmapStore
+    from models.user import User
+    User.load_from_file()
+    store = MmapStore(User, ".db_User.mmap", 1)
+    for i in range(count):
+        user = User(id=str(i), email="user_{}@example.com".format(i))
+        user.password = "pwd"
+        _store(user)
+        store.save(user)
+    _write_snapshot('User')
+
+
+def measure():
+    """ Load users with the configured backend and report time and memory
+    """
+    before = rss_mb()
+    start = time.perf_counter()
+    from models.user import User
+    User.load_from_file()
+    elapsed = time.perf_counter() - start
+    assert User.get('12345').email == "user_12345@example.com"
+    assert len(User.search({'email': "user_42@example.com"})) == 1
+    print("{:>6} {:>10,} {:>12.1f} {:>12.0f}".format(
+        os.environ["BASE_STORAGE"], User.count(), elapsed,
+        rss_mb() - before))
+
+
+def main():
+    """ Populate 1M users, then measure each backend in a fresh process
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "measure":
+        measure()
+        return
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, here)
+    populate(1000000)
+    print("{:>6} {:>10} {:>12} {:>12}".format(
+        "store", "users", "startup (s)", "RSS (MB)"))
+    for storage in ("json", "mmap"):
+        env = dict(os.environ, BASE_STORAGE=storage,
+                   PYTHONPATH=here)
+        subprocess.run([sys.executable, os.path.join(here, "bench_mmap.py"),
+                        "measure"], env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+""" Benchmark of time to first byte and peak memory of GET /api/v1/users
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+USERS = 200000
+
+
+def fetch(client, url: str, headers: dict = None) -> tuple:
+    """ Time to first byte and total time of a request, in seconds
+    """
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    """ Compare the full list, one page and the NDJSON stream
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, here)
+    os.environ.pop("AUTH_TYPE", None)
+    from api.v1.app import app
+    from models.base import _store
+    from models.user import User
+    for i in range(USERS):
+        user = User(id="{:08d}".format(i),
+                    email="user_{}@example.com".format(i))
+        user.password = "pwd"
+        _store(user)
+    client = app.test_client()
+    cases = (
+        ("full list", "/api/v1/users", None),
+        ("page of 100", "/api/v1/users?limit=100&after=00100000", None),
+        ("NDJSON stream", "/api/v1/users",
+         {"Accept": "application/x-ndjson"}),
+    )
+    print("{:>14} {:>10} {:>10} {:>10} {:>10}".format(
+        "response", "TTFB (ms)", "total (s)", "MB sent", "peak (MB)"))
+    for name, url, headers in cases:
+        first, total, size = fetch(client, url, headers)
+        tracemalloc.start()
+        fetch(client, url, headers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:>14} {:>10.1f} {:>10.2f} {:>10.1f} {:>10.1f}".format(
+            name, first * 1000, total, size / 2 ** 20, peak / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+""" Microbenchmark of Auth.require_auth against many exclusion rules
+"""
+import re
+import timeit
+from typing import List
+
+from api.v1.auth.auth import Auth
+
+
+def legacy_require_auth(path: str, excluded_paths: List[str]) -> bool:
+    """ Matches the path against each exclusion rule in turn
+    """
+    if path is not None and excluded_paths is not None:
+        for exclusion_path in map(lambda x: x.strip(), excluded_paths):
+            pattern = ''
+            if exclusion_path[-1] == '*':
+                pattern = '{}.*'.format(exclusion_path[0:-1])
+            elif exclusion_path[-1] == '/':
+                pattern = '{}/*'.format(exclusion_path[0:-1])
+            else:
+                pattern = '{}/*'.format(exclusion_path)
+            if re.match(pattern, path):
+                return False
+    return True
+
+
+def make_rules(count: int) -> List[str]:
+    """ Exclusion rules mixing exact paths, trailing slashes and wildcards
+    """
+    suffixes = ('', '/', '*')
+    return ['/api/v1/public_{}{}'.format(i, suffixes[i % 3])
+            for i in range(count)]
+
+
+def main():
+    """ Prints calls per second for a protected and an excluded path
+    """
+    number = 20000
+    auth = Auth()
+    print("{:>6} {:>10} {:>14} {:>14} {:>8}".format(
+        "rules", "path", "before (c/s)", "after (c/s)", "speedup"))
+    for count in (5, 50, 500):
+        rules = make_rules(count)
+        for name, path in (("protected", "/api/v1/users"),
+                           ("excluded", "/api/v1/public_{}/x".format(
+                               count - 1))):
+            assert legacy_require_auth(path, rules) == \
+                auth.require_auth(path, rules)
+            before = number / timeit.timeit(
+                lambda: legacy_require_auth(path, rules), number=number)
+            after = number / timeit.timeit(
+                lambda: auth.require_auth(path, rules), number=number)
+            print("{:>6} {:>10} {:>14,.0f} {:>14,.0f} {:>7.1f}x".format(
+                count, name, before, after, after / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+""" Benchmark of User.search by email with and without the email index
+"""
+import time
+from models.base import DATA
+from models.user import User
+
+
+def main():
+    """ Time email lookups through the index and through a linear scan
+    """
+    count = 1000000
+    User.save_to_file = classmethod(lambda cls: None)
+    start = time.perf_counter()
+    for i in range(count):
+        user = User(id=str(i))
+        user.email = "user_{}@example.com".format(i)
+        user.save()
+    print("populated {:,} users in {:.1f}s".format(
+        count, time.perf_counter() - start))
+
+    emails = ["user_{}@example.com".format(i * 997 % count)
+              for i in range(1000)]
+    start = time.perf_counter()
+    for email in emails:
+        assert len(User.search({'email': email})) == 1
+    indexed = (time.perf_counter() - start) / len(emails)
+
+    scanned_emails = emails[:10]
+    start = time.perf_counter()
+    for email in scanned_emails:
+        found = [u for u in DATA['User'].values() if u.email == email]
+        assert len(found) == 1
+    scanned = (time.perf_counter() - start) / len(scanned_emails)
+
+    print("indexed search: {:10.2f} us/lookup".format(indexed * 1e6))
+    print("linear scan:    {:10.2f} us/lookup".format(scanned * 1e6))
+
+
+if __name__ == "__main__":
+    main()
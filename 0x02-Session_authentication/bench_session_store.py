@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" Benchmark of the session store on each storage driver
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+SESSIONS = 100000
+USERS = 1000
+
+
+def per_op_us(func, number: int) -> float:
+    """ Mean duration of `func(i)` in microseconds
+    """
+    start = time.perf_counter()
+    for i in range(number):
+        func(i)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def measure():
+    """ Time create, lookup, destroy and reload with SESSIONS sessions
+    """
+    from models.session_store import SessionStore
+    from models.user_session import UserSession
+    store = SessionStore()
+    session_ids = [str(uuid.uuid4()) for _ in range(SESSIONS)]
+    create = per_op_us(lambda i: store.add(UserSession(
+        user_id="user_{}".format(i % USERS), session_id=session_ids[i])),
+        SESSIONS)
+    lookup = per_op_us(lambda i: store.get(session_ids[i * 7 % SESSIONS]),
+                       100000)
+    destroy = per_op_us(lambda i: store.remove(session_ids[i]), 10000)
+    logout_all = per_op_us(
+        lambda i: store.remove_user("user_{}".format(i)), 100)
+    start = time.perf_counter()
+    SessionStore()
+    print("{:>7} {:>12.1f} {:>12.2f} {:>12.1f} {:>12.1f} {:>10.1f}".format(
+        os.environ["BASE_STORAGE"], create, lookup, destroy, logout_all,
+        time.perf_counter() - start))
+
+
+def main():
+    """ Run the store against every driver, each in a fresh process
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "measure":
+        measure()
+        return
+    here = os.path.dirname(os.path.abspath(__file__))
+    print("{:,} sessions of {:,} users".format(SESSIONS, USERS))
+    print("{:>7} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+        "store", "create (us)", "lookup (us)", "destroy (us)",
+        "logout (us)", "reload (s)"))
+    for storage in ("json", "mmap", "sqlite"):
+        env = dict(os.environ, BASE_STORAGE=storage, PYTHONPATH=here,
+                   BASE_JOURNAL_FSYNC="never")
+        subprocess.run([sys.executable, os.path.join(
+            here, "bench_session_store.py"), "measure"], env=env, check=True,
+            cwd=tempfile.mkdtemp())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" Soak test of SessionExpAuth memory with many short-lived sessions
+"""
+import os
+import sys
+import time
+
+
+SESSIONS = 10000000
+REPORT_EVERY = 1000000
+
+
+def rss_mb() -> float:
+    """ Resident set size of this process in megabytes
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    """ Create sessions lasting one second and report memory as they churn
+    """
+    os.environ["SESSION_DURATION"] = "1"
+    os.environ.setdefault("SESSION_SWEEP_INTERVAL", "0.2")
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+    auth = SessionExpAuth()
+    print("{:>10} {:>8} {:>10} {:>10} {:>12} {:>9}".format(
+        "created", "secs", "live", "pending", "evictions", "RSS (MB)"))
+    start = time.perf_counter()
+    for i in range(1, sessions + 1):
+        auth.create_session("user_{}".format(i % 1000))
+        if i % REPORT_EVERY == 0:
+            stats = auth.stats()
+            print("{:>10,} {:>8.0f} {:>10,} {:>10,} {:>12,} {:>9.0f}".format(
+                i, time.perf_counter() - start, stats["live_sessions"],
+                stats["pending_expiries"], stats["evictions"], rss_mb()))
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    main()
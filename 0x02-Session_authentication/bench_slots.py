@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+""" Benchmark of the __slots__ models against __dict__-backed ones
+"""
+from datetime import datetime
+import time
+import tracemalloc
+from models.base import TIMESTAMP_FORMAT
+from models.user import User
+
+
+class DictUser():
+    """ User stored in a per-instance __dict__, as before __slots__
+    """
+
+    def __init__(self, id: str, email: str, created_at: datetime):
+        """ Initialize a DictUser instance
+        """
+        self.id = id
+        self.created_at = created_at
+        self.updated_at = created_at
+        self.email = email
+        self._password = None
+        self.first_name = None
+        self.last_name = None
+
+    def to_json(self, for_serialization: bool = False) -> dict:
+        """ Convert the object a JSON dictionary
+        """
+        result = {}
+        for key, value in self.__dict__.items():
+            if not for_serialization and key[0] == '_':
+                continue
+            if type(value) is datetime:
+                result[key] = value.strftime(TIMESTAMP_FORMAT)
+            else:
+                result[key] = value
+        return result
+
+
+def make_user(obj_id: str, now: datetime) -> User:
+    """ Create a User sharing the timestamp object, like DictUser does
+    """
+    user = User(id=obj_id, email=obj_id)
+    user.created_at = now
+    user.updated_at = now
+    return user
+
+
+def build(factory, ids: list, now: datetime) -> tuple:
+    """ Create one object per id, returning them with bytes per object
+    """
+    tracemalloc.start()
+    objs = [factory(obj_id, now) for obj_id in ids]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objs, size / len(ids)
+
+
+def throughput(objs: list, rounds: int = 3) -> float:
+    """ Best to_json calls per second over a list of objects
+    """
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for obj in objs:
+            obj.to_json()
+        best = max(best, len(objs) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    """ Print bytes per object and to_json throughput at 1M instances
+    """
+    count = 1000000
+    now = datetime.utcnow()
+    ids = [str(i) for i in range(count)]
+    print("{:>8} {:>14} {:>14}".format("model", "bytes/object", "to_json/s"))
+    factories = (
+        ("__dict__", lambda i, now: DictUser(i, i, now)),
+        ("__slots__", make_user),
+    )
+    for name, factory in factories:
+        objs, per_object = build(factory, ids, now)
+        print("{:>8} {:>14.0f} {:>14,.0f}".format(
+            name, per_object, throughput(objs)))
+        del objs
+
+
+if __name__ == "__main__":
+    main()
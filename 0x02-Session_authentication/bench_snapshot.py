@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Benchmark of snapshot save latency with the per-object JSON cache
+"""
+from datetime import datetime
+import json
+import os
+import tempfile
+import time
+from models.base import DATA, _store, _write_snapshot
+from models.user import User
+
+
+def legacy_save():
+    """ Re-encode every object and dump it straight into the file
+    """
+    objs_json = {}
+    for obj_id, obj in DATA['User'].items():
+        objs_json[obj_id] = obj.to_json(True)
+    with open(".db_User.json", 'w') as f:
+        json.dump(objs_json, f)
+
+
+def timed(func) -> float:
+    """ Run a function once and return its duration in milliseconds
+    """
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    """ Print save latencies at 10k, 100k and 1M users
+    """
+    os.chdir(tempfile.mkdtemp())
+    User.load_from_file()
+    print("{:>9} {:>12} {:>12} {:>12}".format(
+        "objects", "legacy (ms)", "cold (ms)", "1 dirty (ms)"))
+    for count in (10000, 100000, 1000000):
+        for i in range(User.count(), count):
+            user = User(id=str(i), email="user_{}@example.com".format(i))
+            user.password = "pwd"
+            _store(user)
+        legacy = timed(legacy_save)
+        cold = timed(lambda: _write_snapshot('User'))
+        User.get('0').first_name = "Bob"
+        User.get('0').updated_at = datetime.utcnow()
+        warm = timed(lambda: _write_snapshot('User'))
+        print("{:>9,} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+            count, legacy, cold, warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,39 +2,406 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import Callable, TypeVar, List, Iterable, Tuple
+from os import getenv, path
+from models.journal import Journal, Compactor
+import atexit
+import bisect
+import importlib
 import json
+import os
+import tempfile
+import threading
+import time
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+ORDERS = {}
+JOURNALS = {}
+SNAPSHOT_CACHE = {}
+JOURNAL_ENABLED = getenv("BASE_JOURNAL", "0") == "1"
+JOURNAL_FSYNC = getenv("BASE_JOURNAL_FSYNC", "always")
+JOURNAL_FSYNC_INTERVAL = float(getenv("BASE_JOURNAL_FSYNC_INTERVAL", "1"))
+JOURNAL_COMPACT_INTERVAL = float(
+    getenv("BASE_JOURNAL_COMPACT_INTERVAL", "30"))
+JOURNAL_COMPACT_RECORDS = int(getenv("BASE_JOURNAL_COMPACT_RECORDS", "10000"))
+STORAGE = getenv("BASE_STORAGE", "json")
+DRIVERS = {
+    "json": ("models.base", "JsonFileDriver"),
+    "mmap": ("models.mmap_store", "MmapDriver"),
+    "sqlite": ("models.sql_store", "SqliteDriver"),
+}
+GROUP_COMMIT_ENABLED = getenv("BASE_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW = float(getenv("BASE_GROUP_COMMIT_WINDOW_MS", "5")) / 1000
+GROUP_COMMIT_BATCH = int(getenv("BASE_GROUP_COMMIT_BATCH", "64"))
+TEMPLATES = {}
+LAYOUTS = {}
+LISTENERS = {}
+_UNSET = object()
+_compactor = None
+_snapshot_lock = threading.Lock()
+_write_lock = threading.RLock()
+_group_committer = None
+_group_committer_pid = None
+_group_committer_lock = threading.Lock()
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+
+    The fixed format is handed to the much faster fromisoformat
+    """
+    if len(value) == 19 and value[10] == 'T':
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _layout(cls: type) -> Tuple[Tuple[str, ...], bool]:
+    """ Slots declared along the MRO of a class, base first, and whether
+    its instances also get a __dict__
+    """
+    if cls not in LAYOUTS:
+        names = []
+        has_dict = False
+        for klass in reversed(cls.__mro__[:-1]):
+            slots = klass.__dict__.get('__slots__')
+            if slots is None:
+                has_dict = True
+                continue
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name == '__dict__':
+                    has_dict = True
+                elif name != '__weakref__' and name not in names:
+                    names.append(name)
+        LAYOUTS[cls] = (tuple(names), has_dict)
+    return LAYOUTS[cls]
+
+
+def _attributes(obj: TypeVar('Base')) -> List[Tuple[str, object]]:
+    """ Attribute names and values of an object, in declaration order
+    """
+    names, has_dict = _layout(obj.__class__)
+    result = []
+    for name in names:
+        value = getattr(obj, name, _UNSET)
+        if value is not _UNSET:
+            result.append((name, value))
+    if has_dict:
+        result.extend(obj.__dict__.items())
+    return result
+
+
+def _index_add(obj: TypeVar('Base')):
+    """ Add a stored object to the indexes of its class
+    """
+    indexes = INDEXES[obj.__class__.__name__]
+    for attr in obj.indexed_attributes:
+        bucket = indexes[attr].setdefault(getattr(obj, attr, None), {})
+        bucket[obj.id] = obj
+
+
+def _index_remove(obj: TypeVar('Base')):
+    """ Remove a stored object from the indexes of its class
+    """
+    indexes = INDEXES[obj.__class__.__name__]
+    for attr in obj.indexed_attributes:
+        value = getattr(obj, attr, None)
+        bucket = indexes[attr].get(value, {})
+        bucket.pop(obj.id, None)
+        if len(bucket) == 0:
+            indexes[attr].pop(value, None)
+
+
+def _store(obj: TypeVar('Base')):
+    """ Put an object in DATA, replacing any instance with the same id
+    """
+    s_class = obj.__class__.__name__
+    objs = DATA[s_class]
+    with _write_lock:
+        if objs.get(obj.id) is not None:
+            _index_remove(objs[obj.id])
+        else:
+            bisect.insort(ORDERS[s_class], obj.id)
+        objs[obj.id] = obj
+        _index_add(obj)
+
+
+def _unstore(s_class: str, obj_id: str) -> TypeVar('Base'):
+    """ Drop an object from DATA, returning it or None if absent
+    """
+    with _write_lock:
+        obj = DATA[s_class].pop(obj_id, None)
+        if obj is not None:
+            _index_remove(obj)
+            order = ORDERS[s_class]
+            del order[bisect.bisect_left(order, obj_id)]
+        return obj
+
+
+def _copy_values(objs: dict) -> list:
+    """ Copy of the values of a DATA or index dictionary
+
+    Copying a dict is atomic, so readers iterate over the copy without
+    taking _write_lock while writers keep mutating the original
+    """
+    return list(objs.values())
+
+
+def _snapshot_path(s_class: str) -> str:
+    """ Path of the JSON snapshot of a class
+    """
+    return ".db_{}.json".format(s_class)
+
+
+def _journal_path(s_class: str) -> str:
+    """ Path of the journal of a class
+    """
+    return ".db_{}.journal".format(s_class)
+
+
+def _encode(s_class: str, obj: TypeVar('Base'), cache: dict) -> str:
+    """ JSON text of an object, re-encoded only if updated since cached
+    """
+    cached = SNAPSHOT_CACHE.get(s_class, {}).get(obj.id)
+    if cached is not None and cached[0] == obj.updated_at:
+        text = cached[1]
+    else:
+        text = json.dumps(obj.to_json(True))
+    cache[obj.id] = (obj.updated_at, text)
+    return text
+
+
+def _write_snapshot(s_class: str):
+    """ Write all objects of a class to its snapshot file
+
+    The file is written to a temporary file, fsynced and renamed over
+    the snapshot, so a crash never leaves a truncated store
+    """
+    file_path = _snapshot_path(s_class)
+    with _snapshot_lock:
+        cache = {}
+        parts = []
+        for obj_id, obj in list(DATA[s_class].items()):
+            text = _encode(s_class, obj, cache)
+            parts.append("{}: {}".format(json.dumps(obj_id), text))
+        SNAPSHOT_CACHE[s_class] = cache
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=path.basename(file_path) + ".",
+            dir=path.dirname(file_path) or ".")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                mode = 0o644
+                if path.exists(file_path):
+                    mode = os.stat(file_path).st_mode & 0o777
+                os.fchmod(f.fileno(), mode)
+                f.write("{" + ", ".join(parts) + "}")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def compact_journals(min_records: int = 0):
+    """ Fold every journal holding more than `min_records` into a snapshot
+    """
+    for s_class, journal in list(JOURNALS.items()):
+        with journal.lock:
+            if journal.records > min_records:
+                _write_snapshot(s_class)
+                journal.truncate()
+
+
+def _get_journal(s_class: str) -> Journal:
+    """ Open the journal of a class and start the compactor if needed
+    """
+    global _compactor
+    if s_class not in JOURNALS:
+        JOURNALS[s_class] = Journal(_journal_path(s_class), JOURNAL_FSYNC,
+                                    JOURNAL_FSYNC_INTERVAL)
+    if _compactor is None:
+        _compactor = Compactor(
+            lambda: compact_journals(JOURNAL_COMPACT_RECORDS),
+            JOURNAL_COMPACT_INTERVAL)
+        _compactor.start()
+    return JOURNALS[s_class]
+
+
+class GroupCommitter():
+    """ Batch the snapshot writes of concurrent mutations
+
+    Mutations arriving within `window` seconds, or until `max_batch`
+    of them are pending, share one write and one fsync per dirty class.
+    Callers block until their batch is durable, and get the error of
+    their own batch if its write failed.
+    """
+
+    def __init__(self, window: float, max_batch: int):
+        """ Start the writer thread
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self.commits = 0
+        self.mutations = 0
+        self._started = time.monotonic()
+        self._dirty = set()
+        self._pending = 0
+        self._collecting = 1
+        self._durable = 0
+        self._waiters = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._done = threading.Condition(self._lock)
+        self._thread = threading.Thread(
+            target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def commit(self, s_class: str):
+        """ Mark a class dirty and wait until its batch is written
+        """
+        with self._lock:
+            self._dirty.add(s_class)
+            self._pending += 1
+            batch = self._collecting
+            self._waiters[batch] = self._waiters.get(batch, 0) + 1
+            if self._pending == 1 or self._pending >= self.max_batch:
+                self._work.notify()
+            while self._durable < batch:
+                self._done.wait()
+            self._waiters[batch] -= 1
+            if self._waiters[batch] == 0:
+                del self._waiters[batch]
+                error = self._errors.pop(batch, None)
+            else:
+                error = self._errors.get(batch)
+            if error is not None:
+                raise error
+
+    def _run(self):
+        """ Write batches until the process exits
+        """
+        while True:
+            with self._lock:
+                while not self._dirty:
+                    self._work.wait()
+                deadline = time.monotonic() + self.window
+                while self._pending < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._work.wait(remaining)
+                dirty, self._dirty = self._dirty, set()
+                count, self._pending = self._pending, 0
+                batch = self._collecting
+                self._collecting += 1
+            error = None
+            try:
+                for s_class in dirty:
+                    _write_snapshot(s_class)
+            except Exception as e:
+                error = e
+            with self._lock:
+                self._durable = batch
+                if error is not None:
+                    self._errors[batch] = error
+                self.commits += 1
+                self.mutations += count
+                self._done.notify_all()
+
+    def stats(self) -> dict:
+        """ Report commits per second and the mean batch size
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            return {
+                "commits": self.commits,
+                "mutations": self.mutations,
+                "commits_per_sec": self.commits / elapsed,
+                "mean_batch_size": self.mutations / max(self.commits, 1),
+            }
+
+
+def get_group_committer() -> GroupCommitter:
+    """ Retrieve the process-wide group committer
+
+    A forked child doesn't inherit the writer thread, so it gets a new
+    committer
+    """
+    global _group_committer, _group_committer_pid
+    with _group_committer_lock:
+        if _group_committer is None or _group_committer_pid != os.getpid():
+            _group_committer = GroupCommitter(GROUP_COMMIT_WINDOW,
+                                              GROUP_COMMIT_BATCH)
+            _group_committer_pid = os.getpid()
+        return _group_committer
+
+
+@atexit.register
+def _sync_journals():
+    """ Flush journals whose records are not fsynced yet
+    """
+    for journal in JOURNALS.values():
+        if journal.fsync != 'always':
+            journal.sync()
 
 
 class Base():
     """ Base class
+
+    Attributes live in __slots__ rather than a per-instance __dict__.
+    The JSON driver journals the mutations of a class setting
+    `journaled` even when BASE_JOURNAL is off
     """
+    __slots__ = ('id', 'created_at', 'updated_at')
+    indexed_attributes = ()
+    journaled = False
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            with _write_lock:
+                if DATA.get(s_class) is None:
+                    INDEXES[s_class] = {
+                        a: {} for a in self.indexed_attributes}
+                    ORDERS[s_class] = []
+                    DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = _parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = _parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, keeping the indexes of stored objects current
+        """
+        if name not in self.indexed_attributes or not self._is_stored():
+            super().__setattr__(name, value)
+            return
+        with _write_lock:
+            _index_remove(self)
+            super().__setattr__(name, value)
+            _index_add(self)
+
+    def _is_stored(self) -> bool:
+        """ Check if this instance is the one stored in DATA
+        """
+        s_class = self.__class__.__name__
+        return DATA[s_class].get(getattr(self, 'id', None)) is self
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -48,7 +415,7 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in _attributes(self):
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -58,55 +425,78 @@ class Base():
         return result
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def _from_json(cls, obj_json: dict) -> TypeVar('Base'):
+        """ Build an object from its serialized form, skipping __init__
+
+        Attributes missing from `obj_json` take the values __init__ gives
+        an instance built without arguments, so subclasses must only
+        assign attributes from kwargs in their __init__. Keys matching no
+        attribute of the class are dropped
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        if s_class not in TEMPLATES:
+            TEMPLATES[s_class] = dict(_attributes(cls(id=None)))
+        attrs = dict(TEMPLATES[s_class])
+        attrs.update(obj_json)
+        if 'id' not in obj_json:
+            attrs['id'] = str(uuid.uuid4())
+        for key in ('created_at', 'updated_at'):
+            value = obj_json.get(key)
+            if value is not None:
+                attrs[key] = _parse_timestamp(value)
+            else:
+                attrs[key] = datetime.utcnow()
+        obj = cls.__new__(cls)
+        for key, value in attrs.items():
+            try:
+                object.__setattr__(obj, key, value)
+            except AttributeError:
+                continue
+        return obj
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def load_from_file(cls):
+        """ Load all objects from file
+        """
+        get_driver().load(cls)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        get_driver().flush(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        get_driver().save(self)
+        self._notify("save")
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        get_driver().remove(self)
+        self._notify("remove")
+
+    @classmethod
+    def add_listener(cls, listener: Callable[[str, 'Base'], None]):
+        """ Call `listener(op, obj)` after each save or remove of an
+        object of this class, in the process doing it
+        """
+        LISTENERS.setdefault(cls.__name__, []).append(listener)
+
+    def _notify(self, op: str):
+        """ Tell the listeners of this class about a mutation
+        """
+        for listener in LISTENERS.get(self.__class__.__name__, ()):
+            listener(op, self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return get_driver().count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,14 +508,140 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return get_driver().get(cls, id)
+
+    @classmethod
+    def page(cls, limit: int, after: str = None) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting after
+        the ID `after`
+        """
+        return get_driver().page(cls, limit, after)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        return get_driver().search(cls, attributes)
+
+
+class JsonFileDriver():
+    """ Storage driver keeping every object in DATA, persisted to
+    .db_<Class>.json snapshots
+    """
+
+    def load(self, cls: type):
+        """ Load all objects of a class from file
+
+        The snapshot is read first, then the journal is replayed over it
+        """
+        s_class = cls.__name__
+        file_path = _snapshot_path(s_class)
+        with _write_lock:
+            INDEXES[s_class] = {a: {} for a in cls.indexed_attributes}
+            DATA[s_class] = {}
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    objs_json = json.load(f)
+                    for obj_id, obj_json in objs_json.items():
+                        obj = cls._from_json(obj_json)
+                        DATA[s_class][obj_id] = obj
+                        _index_add(obj)
+            ORDERS[s_class] = sorted(DATA[s_class])
+
+            replayed = 0
+            for record in Journal.replay(_journal_path(s_class)):
+                replayed += 1
+                if record["op"] == "save":
+                    _store(cls._from_json(record["obj"]))
+                else:
+                    _unstore(s_class, record["id"])
+        if JOURNAL_ENABLED or cls.journaled:
+            _get_journal(s_class).records += replayed
+        elif replayed:
+            _write_snapshot(s_class)
+            os.remove(_journal_path(s_class))
+
+    def flush(self, cls: type):
+        """ Save all objects of a class to file
+        """
+        _write_snapshot(cls.__name__)
+
+    def mapping(self, name: str) -> dict:
+        """ Dictionary for state outside of the models, local to the
+        process
+        """
+        return {}
+
+    def _persist(self, op: str, obj: Base):
+        """ Make one mutation durable
+
+        In journal mode only the mutation is appended, otherwise the
+        whole class is saved to file, possibly batched with other
+        mutations by the group committer
+        """
+        s_class = obj.__class__.__name__
+        if JOURNAL_ENABLED or obj.journaled:
+            obj_json = obj.to_json(True) if op == "save" else None
+            _get_journal(s_class).append(op, obj.id, obj_json)
+        elif GROUP_COMMIT_ENABLED:
+            get_group_committer().commit(s_class)
+        else:
+            obj.__class__.save_to_file()
+
+    def save(self, obj: Base):
+        """ Store an object and persist it
+        """
+        with _write_lock:
+            if not obj._is_stored():
+                _store(obj)
+        self._persist("save", obj)
+
+    def remove(self, obj: Base):
+        """ Drop an object and persist its removal
+        """
+        if _unstore(obj.__class__.__name__, obj.id) is not None:
+            self._persist("remove", obj)
+
+    def count(self, cls: type) -> int:
+        """ Count all objects of a class
+        """
+        return len(DATA[cls.__name__].keys())
+
+    def get(self, cls: type, id: str) -> Base:
+        """ Return one object by ID
+        """
+        return DATA[cls.__name__].get(id)
+
+    def page(self, cls: type, limit: int, after: str = None) -> List[Base]:
+        """ Up to `limit` objects ordered by id, after the id `after`
+
+        The lock is only held to find and copy the page ids, so that a
+        concurrent insert or removal can't shift the page by one
+        """
         s_class = cls.__name__
+        order = ORDERS[s_class]
+        with _write_lock:
+            start = 0 if after is None else bisect.bisect_right(order, after)
+            obj_ids = order[start:start + limit]
+        objs = DATA[s_class]
+        page = [objs.get(obj_id) for obj_id in obj_ids]
+        return [obj for obj in page if obj is not None]
+
+    def search(self, cls: type, attributes: dict) -> List[Base]:
+        """ Search all objects with matching attributes
+
+        Uses the index of the first indexed attribute of the query, if any.
+        Never blocks on writers: it scans a copy of the candidates
+        """
+        s_class = cls.__name__
+        candidates = None
+        for k, v in attributes.items():
+            if k in cls.indexed_attributes:
+                candidates = _copy_values(INDEXES[s_class][k].get(v, {}))
+                break
+        if candidates is None:
+            candidates = _copy_values(DATA[s_class])
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +649,19 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        return list(filter(_search, candidates))
+
+
+def get_driver():
+    """ Retrieve the storage driver named by BASE_STORAGE
+    """
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            if STORAGE not in DRIVERS:
+                raise ValueError("Unknown storage: {}".format(STORAGE))
+            module_name, class_name = DRIVERS[STORAGE]
+            module = importlib.import_module(module_name)
+            _driver = getattr(module, class_name)()
+        return _driver
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from typing import Callable, Iterator
+from os import path
+import json
+import os
+import threading
+import time
+
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class Journal():
+    """ Append-only log of the mutations of one class
+    """
+
+    def __init__(self, file_path: str, fsync: str = 'always',
+                 fsync_interval: float = 1.0):
+        """ Open a journal for appending
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy: {}".format(fsync))
+        self.file_path = file_path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self.lock = threading.RLock()
+        self._last_sync = time.monotonic()
+        self._file = open(file_path, 'a')
+        self._drop_torn_tail()
+
+    def _drop_torn_tail(self):
+        """ Cut a last line left incomplete by a crash mid-append, so new
+        records don't get glued to it
+        """
+        end = self._file.tell()
+        with open(self.file_path, 'rb') as f:
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+        if end != self._file.tell():
+            self._file.truncate(end)
+            self._file.seek(0, os.SEEK_END)
+
+    def append(self, op: str, obj_id: str, obj_json: dict = None):
+        """ Write one mutation record
+        """
+        line = json.dumps({"op": op, "id": obj_id, "obj": obj_json})
+        with self.lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records += 1
+            now = time.monotonic()
+            if self.fsync == 'always' or (
+                    self.fsync == 'interval' and
+                    now - self._last_sync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+    def sync(self):
+        """ Force pending records to disk
+        """
+        with self.lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def truncate(self):
+        """ Drop every record, once they are folded into a snapshot
+        """
+        with self.lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records = 0
+
+    def close(self):
+        """ Close the journal file
+        """
+        with self.lock:
+            self._file.close()
+
+    @staticmethod
+    def replay(file_path: str) -> Iterator[dict]:
+        """ Read back the records of a journal file
+
+        A torn last line, left by a crash mid-append, is ignored
+        """
+        if not path.exists(file_path):
+            return
+        with open(file_path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+
+class Compactor(threading.Thread):
+    """ Background thread folding journals into snapshots
+    """
+
+    def __init__(self, compact: Callable[[], None], interval: float):
+        """ Initialize a compactor calling `compact` every `interval` seconds
+        """
+        super().__init__(name="journal-compactor", daemon=True)
+        self.compact = compact
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        """ Compact until stopped
+        """
+        while not self.stopped.wait(self.interval):
+            self.compact()
+
+    def stop(self):
+        """ Stop compacting
+        """
+        self.stopped.set()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+""" Memory-mapped store module
+"""
+from collections import OrderedDict
+from typing import List, TypeVar
+import bisect
+import json
+import mmap
+import os
+import threading
+
+
+MMAP_CACHE_SIZE = int(os.getenv("BASE_MMAP_CACHE_SIZE", "10000"))
+
+
+class MmapStore():
+    """ Lazy store of the objects of one class
+
+    Records are appended to a file as `id<TAB>[indexed values]<TAB>json`
+    lines and read back through a memory map. Only an offset index keyed
+    by id, the sorted ids and the indexed attribute values stay in
+    memory; objects are materialized on access and kept in a bounded
+    LRU cache.
+    """
+
+    def __init__(self, cls: type, file_path: str, cache_size: int = 10000):
+        """ Open the store file and index its records
+        """
+        self.cls = cls
+        self.file_path = file_path
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self._file = open(file_path, 'a+b')
+        self._map = None
+        self._load()
+        if self.dead > self.size - self.dead:
+            self.compact()
+
+    def _load(self):
+        """ Scan the file to rebuild the offset and attribute indexes
+        """
+        self.offsets = {}
+        self.values = {}
+        self.indexes = {a: {} for a in self.cls.indexed_attributes}
+        self.cache = OrderedDict()
+        self.dead = 0
+        self.size = 0
+        self._file.seek(0)
+        for line in self._file:
+            if not line.endswith(b'\n'):
+                self._file.truncate(self.size)
+                break
+            obj_id, values, obj_json = line.split(b'\t', 2)
+            obj_id = obj_id.decode()
+            self._forget(obj_id)
+            if len(values) > 0:
+                start = self.size + len(line) - len(obj_json)
+                self.offsets[obj_id] = (start, len(obj_json) - 1)
+                self._remember(obj_id, tuple(json.loads(values)))
+            self.size += len(line)
+        self.order = sorted(self.offsets)
+
+    def _forget(self, obj_id: str):
+        """ Drop a record from the in-memory indexes
+        """
+        if obj_id not in self.offsets:
+            return
+        self.dead += self.offsets.pop(obj_id)[1]
+        for attr, value in zip(self.indexes, self.values.pop(obj_id)):
+            bucket = self.indexes[attr].get(value, {})
+            bucket.pop(obj_id, None)
+            if len(bucket) == 0:
+                self.indexes[attr].pop(value, None)
+
+    def _remember(self, obj_id: str, values: tuple):
+        """ Add a record to the attribute indexes
+        """
+        self.values[obj_id] = values
+        for attr, value in zip(self.indexes, values):
+            self.indexes[attr].setdefault(value, {})[obj_id] = None
+
+    def _append(self, obj_id: str, values: str, obj_json: str) -> int:
+        """ Append one record and return the offset of its JSON part
+        """
+        head = "{}\t{}\t".format(obj_id, values).encode()
+        body = obj_json.encode()
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(head + body + b'\n')
+        self._file.flush()
+        start = self.size + len(head)
+        self.size += len(head) + len(body) + 1
+        return start
+
+    def _read(self, obj_id: str) -> TypeVar('Base'):
+        """ Materialize an object from its record
+        """
+        offset, length = self.offsets[obj_id]
+        if self._map is None or offset + length > len(self._map):
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.cls._from_json(json.loads(
+            self._map[offset:offset + length]))
+
+    def _materialize(self, obj_id: str, cache: bool = True):
+        """ Retrieve an object through the LRU cache
+        """
+        obj = self.cache.get(obj_id)
+        if obj is not None:
+            self.cache.move_to_end(obj_id)
+            return obj
+        if obj_id not in self.offsets:
+            return None
+        obj = self._read(obj_id)
+        if cache:
+            self.cache[obj_id] = obj
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return obj
+
+    def get(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        with self.lock:
+            return self._materialize(obj_id)
+
+    def count(self) -> int:
+        """ Count all objects
+        """
+        return len(self.offsets)
+
+    def page(self, limit: int, after: str = None) -> List[TypeVar('Base')]:
+        """ Up to `limit` objects ordered by id, after the id `after`
+        """
+        with self.lock:
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(self.order, after)
+            return [self._materialize(obj_id, False)
+                    for obj_id in self.order[start:start + limit]]
+
+    def search(self, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        """
+        with self.lock:
+            obj_ids = None
+            for k, v in attributes.items():
+                if k in self.indexes:
+                    obj_ids = list(self.indexes[k].get(v, {}))
+                    break
+            cache = obj_ids is not None
+            if obj_ids is None:
+                obj_ids = list(self.offsets)
+            result = []
+            for obj_id in obj_ids:
+                obj = self._materialize(obj_id, cache)
+                if all(getattr(obj, k) == v for k, v in attributes.items()):
+                    result.append(obj)
+            return result
+
+    def save(self, obj: TypeVar('Base')):
+        """ Append the current state of an object
+        """
+        values = tuple(getattr(obj, a, None) for a in self.indexes)
+        obj_json = json.dumps(obj.to_json(True))
+        with self.lock:
+            start = self._append(obj.id, json.dumps(values), obj_json)
+            if obj.id not in self.offsets:
+                bisect.insort(self.order, obj.id)
+            self._forget(obj.id)
+            self.offsets[obj.id] = (start, len(obj_json.encode()))
+            self._remember(obj.id, values)
+            self.cache[obj.id] = obj
+            self.cache.move_to_end(obj.id)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def remove(self, obj: TypeVar('Base')) -> bool:
+        """ Append a tombstone for an object
+        """
+        with self.lock:
+            if obj.id not in self.offsets:
+                return False
+            self._append(obj.id, "", "")
+            del self.order[bisect.bisect_left(self.order, obj.id)]
+            self._forget(obj.id)
+            self.cache.pop(obj.id, None)
+            return True
+
+    def compact(self):
+        """ Rewrite the file with live records only
+        """
+        with self.lock:
+            tmp_path = self.file_path + ".compact"
+            with open(tmp_path, 'wb') as f:
+                pos = 0
+                self._file.seek(0)
+                for line in self._file:
+                    obj_id, values, obj_json = line.split(b'\t', 2)
+                    start = pos + len(line) - len(obj_json)
+                    live = self.offsets.get(obj_id.decode())
+                    if live is not None and live[0] == start:
+                        f.write(line)
+                    pos += len(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            os.replace(tmp_path, self.file_path)
+            self._file = open(self.file_path, 'a+b')
+            self._load()
+
+
+class MmapDriver():
+    """ Storage driver keeping each class in its own MmapStore
+    """
+
+    def __init__(self):
+        """ Initialize the driver without opening any store
+        """
+        self.stores = {}
+        self.lock = threading.Lock()
+
+    def store(self, cls: type) -> MmapStore:
+        """ Store of a class, opened on first use
+        """
+        s_class = cls.__name__
+        with self.lock:
+            if s_class not in self.stores:
+                self.stores[s_class] = MmapStore(
+                    cls, ".db_{}.mmap".format(s_class), MMAP_CACHE_SIZE)
+            return self.stores[s_class]
+
+    def load(self, cls: type):
+        """ Reopen the store of a class, re-reading its file
+        """
+        with self.lock:
+            self.stores.pop(cls.__name__, None)
+        self.store(cls)
+
+    def flush(self, cls: type):
+        """ Nothing to do, every mutation is appended as it happens
+        """
+
+    def mapping(self, name: str) -> dict:
+        """ Dictionary for state outside of the models, local to the
+        process
+        """
+        return {}
+
+    def save(self, obj: TypeVar('Base')):
+        """ Append the current state of an object
+        """
+        self.store(obj.__class__).save(obj)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Append a tombstone for an object
+        """
+        self.store(obj.__class__).remove(obj)
+
+    def count(self, cls: type) -> int:
+        """ Count all objects of a class
+        """
+        return self.store(cls).count()
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        return self.store(cls).get(id)
+
+    def page(self, cls: type, limit: int,
+             after: str = None) -> List[TypeVar('Base')]:
+        """ Up to `limit` objects ordered by id, after the id `after`
+        """
+        return self.store(cls).page(limit, after)
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        """
+        return self.store(cls).search(attributes)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" Session store module
+"""
+from typing import List
+from models.user_session import UserSession
+
+
+class SessionStore():
+    """ Store of the UserSession objects of SessionDBAuth
+
+    Sessions are kept by the storage driver and found through the
+    session_id and user_id indexes of UserSession. The JSON driver
+    journals them, appending one record per creation or removal, and
+    the SQLite driver keeps them in a table every process shares.
+    """
+
+    def __init__(self):
+        """ Load the stored sessions
+        """
+        UserSession.load_from_file()
+
+    def add(self, user_session: UserSession):
+        """ Store a new session
+        """
+        user_session.save()
+
+    def get(self, session_id: str) -> UserSession:
+        """ Return the session with this ID, or None
+        """
+        user_sessions = UserSession.search({'session_id': session_id})
+        return user_sessions[0] if user_sessions else None
+
+    def remove(self, session_id: str) -> UserSession:
+        """ Delete a session, returning it or None if absent
+        """
+        user_session = self.get(session_id)
+        if user_session is not None:
+            user_session.remove()
+        return user_session
+
+    def all(self) -> List[UserSession]:
+        """ Return every session
+        """
+        return UserSession.all()
+
+    def sessions_of(self, user_id: str) -> List[UserSession]:
+        """ Return every session of a user
+        """
+        return UserSession.search({'user_id': user_id})
+
+    def remove_user(self, user_id: str) -> int:
+        """ Delete every session of a user, returning how many
+        """
+        user_sessions = self.sessions_of(user_id)
+        for user_session in user_sessions:
+            user_session.remove()
+        return len(user_sessions)
+
+    def count(self) -> int:
+        """ Count the live sessions
+        """
+        return UserSession.count()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+""" SQLite store module
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, TypeVar
+from models.base import TIMESTAMP_FORMAT, _layout
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+
+SQLITE_PATH = os.getenv("BASE_SQLITE_PATH", ".db.sqlite3")
+SQLITE_POOL_SIZE = int(os.getenv("BASE_SQLITE_POOL_SIZE", "4"))
+SQLITE_CACHE_SIZE = int(os.getenv("BASE_SQLITE_CACHE_SIZE", "10000"))
+_MISSING = object()
+
+
+class ConnectionPool():
+    """ Fixed-size pool of connections to one SQLite database
+
+    Connections are opened on demand up to `size`, then callers wait
+    for one to be returned
+    """
+
+    def __init__(self, file_path: str, size: int = 4):
+        """ Initialize a pool without opening any connection
+        """
+        self.file_path = file_path
+        self.size = size
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """ Open one connection
+        """
+        conn = sqlite3.connect(self.file_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """ Borrow a connection for the duration of a `with` block
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self.opened < self.size
+                self.opened += create
+            if not create:
+                conn = self._idle.get()
+            else:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._lock:
+                        self.opened -= 1
+                    raise
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+def _quote(name: str) -> str:
+    """ Quote an identifier
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _column_value(value):
+    """ Value of an attribute as stored in a column
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+def _encode_datetime(value: datetime) -> dict:
+    """ JSON form of a datetime in a map value
+    """
+    if type(value) is not datetime:
+        raise TypeError("{} is not JSON serializable".format(type(value)))
+    return {"$datetime": value.isoformat()}
+
+
+def _decode_datetime(obj: dict):
+    """ Datetime of a dict made by _encode_datetime, other dicts as is
+    """
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class SqliteMap(MutableMapping):
+    """ Dictionary kept in a table of the database, so every process
+    using the same file sees the same items
+
+    Keys are strings, values are stored as JSON, with datetimes tagged
+    so they come back as datetimes
+    """
+
+    def __init__(self, driver: 'SqliteDriver', name: str):
+        """ Initialize a map stored in the table `name`
+        """
+        self.driver = driver
+        self.table = _quote("map_" + name)
+        with driver._writer() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS {} "
+                         "(key TEXT PRIMARY KEY, value TEXT)"
+                         .format(self.table))
+
+    def __getitem__(self, key: str):
+        """ Value of a key
+        """
+        with self.driver._reader() as conn:
+            row = conn.execute("SELECT value FROM {} WHERE key = ?".format(
+                self.table), (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0], object_hook=_decode_datetime)
+
+    def __setitem__(self, key: str, value):
+        """ Set the value of a key
+        """
+        with self.driver._writer() as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO {} VALUES (?, ?)".format(
+                self.table), (key, json.dumps(
+                    value, default=_encode_datetime)))
+
+    def __delitem__(self, key: str):
+        """ Remove a key
+        """
+        with self.driver._writer() as conn, conn:
+            if conn.execute("DELETE FROM {} WHERE key = ?".format(
+                    self.table), (key,)).rowcount == 0:
+                raise KeyError(key)
+
+    def pop(self, key: str, default=_MISSING):
+        """ Remove a key and return its value, or `default` if absent
+
+        Reading and deleting happen in one transaction, so a concurrent
+        removal by another thread or process can't make it raise
+        """
+        with self.driver._writer() as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM {} WHERE key = ?".format(
+                self.table), (key,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM {} WHERE key = ?".format(
+                    self.table), (key,))
+        if row is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return json.loads(row[0], object_hook=_decode_datetime)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the keys
+        """
+        with self.driver._reader() as conn:
+            rows = conn.execute("SELECT key FROM {}".format(
+                self.table)).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        """ Number of keys
+        """
+        with self.driver._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM {}".format(
+                self.table)).fetchone()[0]
+
+
+class SqliteDriver():
+    """ Storage driver keeping each class in its own SQLite table
+
+    Every slot of the class is a column, indexed attributes get a
+    secondary index so searches run as indexed WHERE clauses.
+
+    Several processes can share the database file. Writes go through
+    one connection per process, reads through a pool. Objects returned
+    by `get` are cached, and the cache is dropped whenever
+    `PRAGMA data_version` on the writing connection shows another
+    process committed
+    """
+
+    def __init__(self, file_path: str = None, pool_size: int = None,
+                 cache_size: int = None):
+        """ Initialize the driver without opening any connection
+        """
+        self.file_path = file_path or SQLITE_PATH
+        self.pool_size = pool_size or SQLITE_POOL_SIZE
+        self.cache_size = cache_size or SQLITE_CACHE_SIZE
+        self.tables = {}
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.generation = 0
+        self.invalidations = 0
+        self._reset()
+
+    def _reset(self):
+        """ Forget the connections, e.g. ones inherited through fork
+        """
+        self.pid = os.getpid()
+        self.pool = ConnectionPool(self.file_path, self.pool_size)
+        self.lock = threading.RLock()
+        self.data_version = None
+        self._conn = None
+
+    @contextmanager
+    def _writer(self) -> Iterator[sqlite3.Connection]:
+        """ Hold the writing connection of this process
+        """
+        if self.pid != os.getpid():
+            self._reset()
+        with self.lock:
+            if self._conn is None:
+                self._conn = self.pool._connect()
+            yield self._conn
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """ Borrow a reading connection from the pool
+        """
+        if self.pid != os.getpid():
+            self._reset()
+        with self.pool.connection() as conn:
+            yield conn
+
+    def _validate(self) -> int:
+        """ Drop the cache if another process committed since last call
+
+        Returns the cache generation reads may fill the cache for
+        """
+        with self._writer() as conn:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self.cache_lock:
+            if version != self.data_version:
+                if self.data_version is not None:
+                    self.invalidations += 1
+                self.data_version = version
+                self.cache.clear()
+                self.generation += 1
+            return self.generation
+
+    def _cache(self, key: tuple, obj: TypeVar('Base'), generation: int):
+        """ Cache an object read during `generation`
+        """
+        with self.cache_lock:
+            if generation != self.generation:
+                return
+            self.cache[key] = obj
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _table(self, cls: type) -> tuple:
+        """ Columns of the table of a class, created on first use
+        """
+        s_class = cls.__name__
+        columns = self.tables.get(s_class)
+        if columns is not None:
+            return columns
+        with self._writer() as conn, conn:
+            columns = _layout(cls)[0]
+            table = _quote(s_class)
+            conn.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(
+                table, ", ".join(
+                    _quote(c) + (" TEXT PRIMARY KEY" if c == 'id' else "")
+                    for c in columns)))
+            existing = {row["name"] for row in conn.execute(
+                "PRAGMA table_info({})".format(table))}
+            for column in columns:
+                if column not in existing:
+                    conn.execute("ALTER TABLE {} ADD COLUMN {}".format(
+                        table, _quote(column)))
+            for attr in cls.indexed_attributes:
+                conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    _quote("{}_{}".format(s_class, attr)), table,
+                    _quote(attr)))
+            self.tables[s_class] = columns
+        return columns
+
+    def _build(self, cls: type, row: sqlite3.Row) -> TypeVar('Base'):
+        """ Materialize an object from a row
+        """
+        return cls._from_json({k: row[k] for k in row.keys()
+                               if row[k] is not None})
+
+    def mapping(self, name: str) -> SqliteMap:
+        """ Dictionary shared by every process using the database
+        """
+        return SqliteMap(self, name)
+
+    def load(self, cls: type):
+        """ Make sure the table of a class exists
+        """
+        self.tables.pop(cls.__name__, None)
+        self._table(cls)
+        with self.cache_lock:
+            self.cache.clear()
+            self.generation += 1
+
+    def flush(self, cls: type):
+        """ Nothing to do, every mutation is committed as it happens
+        """
+
+    def _invalidate(self, key: tuple) -> int:
+        """ Forget the cached object of a key before writing it
+
+        Starts a new generation, so reads already in flight can't cache
+        what they read before the write. Returns that generation
+        """
+        with self.cache_lock:
+            self.cache.pop(key, None)
+            self.generation += 1
+            return self.generation
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or replace the row of an object
+        """
+        columns = self._table(obj.__class__)
+        values = [_column_value(getattr(obj, c, None)) for c in columns]
+        key = (obj.__class__.__name__, obj.id)
+        self._validate()
+        with self._writer() as conn, conn:
+            generation = self._invalidate(key)
+            conn.execute("INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+                _quote(obj.__class__.__name__),
+                ", ".join(_quote(c) for c in columns),
+                ", ".join("?" * len(columns))), values)
+        self._cache(key, obj, generation)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of an object
+        """
+        self._table(obj.__class__)
+        with self._writer() as conn, conn:
+            self._invalidate((obj.__class__.__name__, obj.id))
+            conn.execute("DELETE FROM {} WHERE id = ?".format(
+                _quote(obj.__class__.__name__)), (obj.id,))
+
+    def count(self, cls: type) -> int:
+        """ Count all objects of a class
+        """
+        self._table(cls)
+        with self._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM {}".format(
+                _quote(cls.__name__))).fetchone()[0]
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self._table(cls)
+        key = (cls.__name__, id)
+        generation = self._validate()
+        with self.cache_lock:
+            obj = self.cache.get(key)
+            if obj is not None:
+                self.cache.move_to_end(key)
+                return obj
+        with self._reader() as conn:
+            row = conn.execute("SELECT * FROM {} WHERE id = ?".format(
+                _quote(cls.__name__)), (id,)).fetchone()
+        if row is None:
+            return None
+        obj = self._build(cls, row)
+        self._cache(key, obj, generation)
+        return obj
+
+    def page(self, cls: type, limit: int,
+             after: str = None) -> List[TypeVar('Base')]:
+        """ Up to `limit` objects ordered by id, after the id `after`,
+        walking the primary key index
+        """
+        self._table(cls)
+        sql = "SELECT * FROM {}".format(_quote(cls.__name__))
+        params = []
+        if after is not None:
+            sql += " WHERE id > ?"
+            params.append(after)
+        params.append(limit)
+        with self._reader() as conn:
+            rows = conn.execute(sql + " ORDER BY id LIMIT ?",
+                                params).fetchall()
+        return [self._build(cls, row) for row in rows]
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+
+        Raises AttributeError for an attribute the class doesn't have,
+        like the in-memory search does
+        """
+        columns = self._table(cls)
+        clauses = []
+        for k in attributes:
+            if k not in columns:
+                raise AttributeError("'{}' object has no attribute '{}'"
+                                     .format(cls.__name__, k))
+            clauses.append("{} IS ?".format(_quote(k)))
+        sql = "SELECT * FROM {}".format(_quote(cls.__name__))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._reader() as conn:
+            rows = conn.execute(sql, [_column_value(v) for v in
+                                      attributes.values()]).fetchall()
+        return [self._build(cls, row) for row in rows]
@@ -7,6 +7,9 @@ from models.base import Base
 class UserSession(Base):
     """Class representing a user session.
     """
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = ('session_id', 'user_id')
+    journaled = True
 
     def __init__(self, *args: list, **kwargs: dict):
         """Initializes an instance of a user session.
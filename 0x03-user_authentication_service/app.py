@@ -4,11 +4,19 @@
 from flask import Flask, jsonify, request, abort, redirect
 
 from auth import Auth
+from hasher import HashingServiceBusy
 
 app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.errorhandler(HashingServiceBusy)
+def service_busy(error) -> str:
+    """Hashing queue saturated handler.
+    """
+    return jsonify({"message": "service busy"}), 503
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index() -> str:
     """GET /
@@ -1,19 +1,75 @@
 #!/usr/bin/env python3
 """A module for authentication-related routines.
 """
+import os
+import time
 import bcrypt
 from uuid import uuid4
 from typing import Union
+from functools import lru_cache
 from sqlalchemy.orm.exc import NoResultFound
 
 from db import DB
+from hasher import HashingService, HashingServiceBusy
 from user import User
 
 
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+CALIBRATION_SAMPLES = 3
+
+
+def _median_hash_ms(rounds: int) -> float:
+    """Times several hashes at a cost, returning the median in ms.
+    """
+    samples = []
+    for _ in range(CALIBRATION_SAMPLES):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+@lru_cache(maxsize=None)
+def _target_rounds() -> int:
+    """Picks the bcrypt cost of new hashes, once per process.
+
+    BCRYPT_ROUNDS sets it outright. Otherwise it is the highest cost
+    whose hash time stays within BCRYPT_TARGET_MS milliseconds (50 by
+    default), but never below DEFAULT_ROUNDS, so a machine under load
+    at startup can't weaken the hashes. Only DEFAULT_ROUNDS is timed,
+    each extra round doubling the work.
+    """
+    rounds = os.getenv("BCRYPT_ROUNDS")
+    if rounds is not None:
+        try:
+            return min(max(int(rounds), MIN_ROUNDS), MAX_ROUNDS)
+        except ValueError:
+            pass
+    try:
+        target_ms = float(os.getenv("BCRYPT_TARGET_MS", "50"))
+    except ValueError:
+        target_ms = 50.0
+    rounds = DEFAULT_ROUNDS
+    hash_ms = _median_hash_ms(rounds)
+    while rounds < MAX_ROUNDS and hash_ms * 2 <= target_ms:
+        hash_ms *= 2
+        rounds += 1
+    return rounds
+
+
+def _hash_rounds(hashed_password: bytes) -> int:
+    """Reads the cost factor stored in a bcrypt hash.
+    """
+    return int(hashed_password.split(b"$")[2])
+
+
 def _hash_password(password: str) -> bytes:
     """Hashes a password.
     """
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    salt = bcrypt.gensalt(_target_rounds())
+    return bcrypt.hashpw(password.encode("utf-8"), salt)
 
 
 def _generate_uuid() -> str:
@@ -28,8 +84,13 @@ class Auth:
 
     def __init__(self):
         """Initializes a new Auth instance.
+
+        The bcrypt cost is calibrated here rather than on the first
+        request that needs it.
         """
         self._db = DB()
+        self._hasher = HashingService()
+        self._rounds = _target_rounds()
 
     def register_user(self, email: str, password: str) -> User:
         """Adds a new user to the database.
@@ -37,23 +98,39 @@ class Auth:
         try:
             self._db.find_user_by(email=email)
         except NoResultFound:
-            return self._db.add_user(email, _hash_password(password))
+            hashed_password = self._hasher.run(_hash_password, password)
+            return self._db.add_user(email, hashed_password)
         raise ValueError("User {} already exists".format(email))
 
     def valid_login(self, email: str, password: str) -> bool:
         """Checks if a user's login details are valid.
+
+        Passwords hashed with a lower cost than the calibrated one are
+        rehashed on a successful login. Hashes are never downgraded, so
+        workers calibrated to different costs don't undo each other.
+        The rehash is skipped when the hashing queue is full.
         """
         user = None
         try:
             user = self._db.find_user_by(email=email)
-            if user is not None:
-                return bcrypt.checkpw(
-                    password.encode("utf-8"),
-                    user.hashed_password,
-                )
         except NoResultFound:
             return False
-        return False
+        if user is None:
+            return False
+        is_valid = self._hasher.run(
+            bcrypt.checkpw,
+            password.encode("utf-8"),
+            user.hashed_password,
+        )
+        if not is_valid:
+            return False
+        if _hash_rounds(user.hashed_password) < self._rounds:
+            try:
+                hashed_password = self._hasher.run(_hash_password, password)
+            except HashingServiceBusy:
+                return True
+            self._db.update_user(user.id, hashed_password=hashed_password)
+        return True
 
     def create_session(self, email: str) -> str:
         """Creates a new session for a user.
@@ -112,7 +189,7 @@ class Auth:
             user = None
         if user is None:
             raise ValueError()
-        new_password_hash = _hash_password(password)
+        new_password_hash = self._hasher.run(_hash_password, password)
         self._db.update_user(
             user.id,
             hashed_password=new_password_hash,
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""A module for running password hashing off the request threads.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class HashingServiceBusy(Exception):
+    """Raised when the hashing queue is full.
+    """
+
+
+class HashingService:
+    """Bounded worker pool for bcrypt calls.
+
+    bcrypt releases the GIL while hashing, so a thread pool is enough to
+    keep the work off the request threads. Submissions beyond
+    `max_pending` fail fast instead of queueing.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        """Initializes a new HashingService instance.
+        """
+        workers = workers or int(
+            os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+        max_pending = max_pending or int(
+            os.getenv("HASH_QUEUE_SIZE", workers * 8))
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(
+            workers, thread_name_prefix="hasher")
+
+    def _call(self, func: Callable, *args) -> Any:
+        """Runs a task on a worker thread.
+        """
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def submit(self, func: Callable, *args) -> Future:
+        """Queues a task, failing fast if the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingServiceBusy()
+        with self._lock:
+            self.pending += 1
+        return self._executor.submit(self._call, func, *args)
+
+    def run(self, func: Callable, *args) -> Any:
+        """Runs a task on the pool and waits for its result.
+        """
+        return self.submit(func, *args).result()
+
+    def metrics(self) -> dict:
+        """Reports the queue depth and task counters.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }